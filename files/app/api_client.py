@@ -0,0 +1,64 @@
+import random
+import streamlit as st
+import requests
+from requests.adapters import HTTPAdapter
+from app_config import APP_CONFIG
+
+# HTTP client settings (generated from the http_* Ansible variables)
+HTTP_CONFIG = APP_CONFIG.get("http", {})
+POOL_SIZE = HTTP_CONFIG.get("pool_size", 20)
+TIMEOUT = (HTTP_CONFIG.get("connect_timeout", 5), HTTP_CONFIG.get("read_timeout", 120))
+MAX_RETRIES = HTTP_CONFIG.get("max_retries", 3)
+RETRY_BACKOFF = HTTP_CONFIG.get("retry_backoff", 0.5)
+MAX_RETRY_DELAY = 30
+
+@st.cache_resource
+def get_session():
+    """Return the keep-alive session shared by every script run in this process"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def post(url, session=None, **kwargs):
+    """POST through the pooled session, applying the configured connect/read timeouts
+
+    Worker threads should pass the session fetched on the script thread, since
+    they run outside Streamlit's script context.
+    """
+    kwargs.setdefault("timeout", TIMEOUT)
+    return (session or get_session()).post(url, **kwargs)
+
+def is_retryable_status(status_code):
+    """Whether a failed response is worth retrying unchanged (rate limited or server-side)"""
+    return status_code == 429 or status_code >= 500
+
+def stop_executor(executor, futures):
+    """Cancel futures that have not started and shut executor down without waiting for running ones
+
+    Same as shutdown(wait=False, cancel_futures=True), which needs Python 3.9.
+    """
+    for future in futures:
+        future.cancel()
+    executor.shutdown(wait=False)
+
+def error_detail(response):
+    """Extract the API's error detail from a failed response"""
+    try:
+        return response.json().get("detail", response.text)
+    except Exception:
+        return response.text
+
+def backoff_delay(attempt, base=RETRY_BACKOFF, cap=MAX_RETRY_DELAY):
+    """Full-jitter exponential backoff: a random delay up to base * 2^(attempt - 1) seconds"""
+    if attempt <= 0:
+        return 0.0
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+class APIError(Exception):
+    """Raised for a non-200 API response, keeping the status code for callers that back off"""
+    def __init__(self, status_code, text):
+        super().__init__(f"{status_code} - {text}")
+        self.status_code = status_code
+        self.text = text
@@ -0,0 +1,172 @@
+import io
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import numpy as np
+import pandas as pd
+import requests
+import api_client
+from app_config import APP_CONFIG
+from utils import SEARCH_API
+
+# Batch search settings (generated from the search_* Ansible variables)
+SEARCH_CONFIG = APP_CONFIG.get("search", {})
+DEFAULT_MAX_IN_FLIGHT = SEARCH_CONFIG.get("max_in_flight", 8)
+
+QUERY_FILE_TYPES = ["txt", "jsonl", "json", "csv"]
+
+# Column names recognised as the query in CSV files
+QUERY_COLUMNS = ["query_text", "query", "text"]
+
+def parse_query(record):
+    """Turn a query file record into {"query_text": ...} or {"query_vector": ...}, or None if unusable
+
+    Accepts a string, a list of numbers, or an object with query_text/text or
+    query_vector/vector.
+    """
+    if isinstance(record, dict):
+        record = record.get("query_text") or record.get("text") or record.get("query_vector") or record.get("vector")
+    if isinstance(record, str) and record.strip():
+        return {"query_text": record.strip()}
+    if isinstance(record, list) and record and all(isinstance(x, (int, float)) for x in record):
+        return {"query_vector": record}
+    return None
+
+def read_query_file(uploaded_file):
+    """Read the queries of an uploaded TXT (one per line), JSONL, JSON array or CSV file
+
+    Returns (queries, skipped) where skipped counts records that were not a usable query.
+    """
+    name = uploaded_file.name.lower()
+    uploaded_file.seek(0)
+    if name.endswith(".csv"):
+        frame = pd.read_csv(uploaded_file, dtype=str)
+        column = next((c for c in QUERY_COLUMNS if c in frame.columns), frame.columns[0])
+        records = frame[column].dropna().tolist()
+    elif name.endswith(".json"):
+        records = json.load(uploaded_file)
+        if not isinstance(records, list):
+            raise ValueError("The uploaded file does not contain a list of queries")
+    else:
+        records = []
+        reader = io.TextIOWrapper(uploaded_file, encoding="utf-8", errors="replace")
+        try:
+            for line in reader:
+                if not line.strip():
+                    continue
+                if name.endswith(".jsonl"):
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        records.append(None)
+                else:
+                    records.append(line)
+        finally:
+            # Detach so closing the wrapper does not close the uploaded file
+            reader.detach()
+
+    queries = [query for query in map(parse_query, records) if query is not None]
+    return queries, len(records) - len(queries)
+
+def post_search(payload, session=None):
+    """POST one search, retrying 429/5xx and connection errors with jittered backoff
+
+    Returns (result, latency in seconds of the successful attempt).
+    """
+    attempt = 0
+    while True:
+        start_time = time.time()
+        try:
+            response = api_client.post(SEARCH_API, session=session, json=payload)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt >= api_client.MAX_RETRIES:
+                raise
+        else:
+            if response.status_code == 200:
+                return response.json(), time.time() - start_time
+            if attempt >= api_client.MAX_RETRIES or not api_client.is_retryable_status(response.status_code):
+                raise api_client.APIError(response.status_code, api_client.error_detail(response))
+        attempt += 1
+        time.sleep(api_client.backoff_delay(attempt))
+
+def search_many(payloads, max_in_flight, session=None):
+    """Run searches concurrently, keeping at most max_in_flight requests outstanding
+
+    payloads is an iterable of (query_index, payload), consumed lazily. Yields
+    (query_index, result, latency, error) in completion order; error is None on success.
+    """
+    session = session or api_client.get_session()
+    payloads = iter(payloads)
+    executor = ThreadPoolExecutor(max_workers=max_in_flight)
+    in_flight = {}
+    try:
+        while True:
+            for query_index, payload in payloads:
+                in_flight[executor.submit(post_search, payload, session)] = query_index
+                if len(in_flight) >= max_in_flight:
+                    break
+            if not in_flight:
+                return
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                query_index = in_flight.pop(future)
+                try:
+                    result, latency = future.result()
+                except Exception as e:
+                    yield query_index, None, None, e
+                    continue
+                yield query_index, result, latency, None
+    finally:
+        api_client.stop_executor(executor, in_flight)
+
+def latency_summary(latencies):
+    """Aggregate latency percentiles in milliseconds"""
+    if not latencies:
+        return {}
+    latencies = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2),
+        "mean": round(float(latencies.mean()), 2),
+        "max": round(float(latencies.max()), 2),
+    }
+
+def query_label(query):
+    """Short description of a query for result tables"""
+    if "query_text" in query:
+        return query["query_text"]
+    return f"vector[{len(query['query_vector'])}]"
+
+def combine_results(queries, outcomes):
+    """Flatten per-query responses into one table with a row per (query, result)
+
+    outcomes maps query index -> (result, latency, error, from_cache).
+    """
+    rows = []
+    for query_index, (result, latency, error, from_cache) in sorted(outcomes.items()):
+        base = {
+            "query_index": query_index + 1,
+            "query": query_label(queries[query_index]),
+            "latency_ms": round(latency * 1000, 2) if latency is not None else None,
+            "cached": from_cache,
+        }
+        if error is not None:
+            rows.append({**base, "error": str(error)})
+            continue
+        items = (result or {}).get("results", [])
+        if not items:
+            rows.append({**base, "rank": None})
+        for rank, item in enumerate(items, start=1):
+            payload = item.get("payload", {})
+            rows.append({
+                **base,
+                "rank": rank,
+                "score": item.get("score", 0),
+                "id": item.get("id", ""),
+                "text": payload.get("text", ""),
+                **{k: v for k, v in payload.items() if k != "text"},
+            })
+    return pd.DataFrame(rows)
@@ -0,0 +1,71 @@
+from api_client import is_retryable_status
+
+# 413 Payload Too Large also backs off, on top of the statuses api_client retries unchanged
+PAYLOAD_TOO_LARGE = 413
+
+def is_backoff_status(status_code):
+    """Whether a failed response should shrink the batch size instead of failing the run"""
+    return status_code is not None and (status_code == PAYLOAD_TOO_LARGE or is_retryable_status(status_code))
+
+class AdaptiveBatchSizer:
+    """Grow or shrink the embedding batch size toward a target per-batch latency
+    
+    Each completed batch proposes the size that would have hit the target latency.
+    Steps are limited to halving or doubling so one noisy sample cannot swing the
+    size too far. 413, 429 and 5xx responses halve the size. A 413 also caps the
+    size at half the rejected batch, or the largest batch that succeeded if that is
+    bigger, so the payload limit is not probed again one text at a time.
+    """
+    def __init__(self, initial_size, target_latency, min_size=1, max_size=512):
+        self.size = initial_size
+        self.target_latency = target_latency
+        self.min_size = min_size
+        self.max_size = max_size
+        self.largest_ok = 0
+        self.history = []
+
+    def observe(self, batch_size, latency, payload_bytes):
+        """Record a successful batch and move the size toward the target latency"""
+        self.history.append({
+            "batch": len(self.history) + 1,
+            "batch_size": batch_size,
+            "latency_ms": round(latency * 1000, 1),
+            "payload_kb": round(payload_bytes / 1024, 1),
+            "texts_per_sec": round(batch_size / latency, 1) if latency > 0 else 0.0,
+            "status": 200,
+        })
+        self.largest_ok = max(self.largest_ok, batch_size)
+        if latency <= 0:
+            return
+        ideal = batch_size * self.target_latency / latency
+        step_limited = min(max(ideal, self.size / 2), self.size * 2)
+        self.size = int(min(max(round(step_limited), self.min_size), self.max_size))
+
+    def back_off(self, batch_size, status_code):
+        """Shrink after a 413/429/5xx response for a batch of batch_size texts"""
+        self.history.append({
+            "batch": len(self.history) + 1,
+            "batch_size": batch_size,
+            "latency_ms": None,
+            "payload_kb": None,
+            "texts_per_sec": 0.0,
+            "status": status_code,
+        })
+        if status_code == 413:
+            ceiling = max(self.largest_ok, batch_size // 2)
+            self.max_size = max(self.min_size, min(self.max_size, ceiling))
+        self.size = max(self.min_size, min(self.size, batch_size) // 2)
+
+def sort_by_length(positions, lengths):
+    """Order positions by text length so each batch holds similar-length texts"""
+    return sorted(positions, key=lambda position: lengths[position])
+
+def padded_cost(lengths, batch_sizes):
+    """Characters the backend processes when lengths are cut into batches of batch_sizes, each padded to its longest text"""
+    cost, start = 0, 0
+    for size in batch_sizes:
+        batch = lengths[start:start + size]
+        if batch:
+            cost += max(batch) * len(batch)
+        start += size
+    return cost
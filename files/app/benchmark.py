@@ -0,0 +1,129 @@
+import time
+import numpy as np
+import pandas as pd
+from batch_search import latency_summary, search_many
+from embed import DEFAULT_MAX_IN_FLIGHT as EMBED_MAX_IN_FLIGHT, embed_texts
+from embed_cache import normalize_text
+
+# Texts per embedding request when preparing benchmark queries
+EMBED_BATCH_SIZE = 32
+
+def query_vectors(queries):
+    """Return a float32 matrix with one vector per query, embedding text queries once through the cache"""
+    texts = [query["query_text"] for query in queries if "query_text" in query]
+    embedded = {}
+    if texts:
+        matrix, stats = embed_texts(texts, EMBED_BATCH_SIZE, EMBED_MAX_IN_FLIGHT)
+        if stats["error"]:
+            raise RuntimeError(f"Could not embed the benchmark queries: {stats['error']}")
+        embedded = dict(zip(texts, matrix))
+    return np.vstack([
+        embedded[query["query_text"]] if "query_text" in query else np.asarray(query["query_vector"], dtype=np.float32)
+        for query in queries
+    ])
+
+def result_keys(result, by="id"):
+    """Keys of a search response's results: ids, or normalized texts to match a local index"""
+    items = (result or {}).get("results", [])
+    if by == "id":
+        return [item.get("id") for item in items]
+    return [normalize_text(item.get("payload", {}).get("text", "")) for item in items]
+
+def recall_at_k(truth, found, k):
+    """Fraction of the k exact neighbours that were returned"""
+    truth = set(truth[:k])
+    if not truth:
+        return None
+    return len(truth & set(found[:k])) / len(truth)
+
+def server_ground_truth(collection_name, vectors, k, metric, max_in_flight, preprocessing=None):
+    """Exact neighbours from the server, scoring every document with the custom search path
+    
+    preprocessing should match the benchmarked searches, so recall compares the same query.
+    """
+    payloads = (
+        (i, {
+            "collection_name": collection_name,
+            "limit": k,
+            "score_all_documents": True,
+            "use_native_search": False,
+            "vector_space": metric,
+            "preprocessing": preprocessing or {},
+            "query_vector": vector.tolist(),
+        })
+        for i, vector in enumerate(vectors)
+    )
+    truth = [None] * len(vectors)
+    for i, result, _, error in search_many(payloads, max_in_flight):
+        if error is not None:
+            raise RuntimeError(f"Ground truth search failed: {error}")
+        truth[i] = result_keys(result, "id")
+    return truth
+
+def local_ground_truth(local_index, vectors, k, metric):
+    """Exact neighbours from the local index, keyed by normalized text"""
+    if local_index.texts is None:
+        raise ValueError("The local index has no texts to match against search results; load an .npz export")
+    indices, _ = local_index.search(vectors, k, metric)
+    return [[normalize_text(local_index.texts[row]) for row in rows] for rows in indices.tolist()]
+
+def run_ef_sweep(collection_name, vectors, truth, ef_values, k, max_in_flight, key_by="id", on_progress=None,
+                 preprocessing=None):
+    """Search every query at each EF value and measure recall@k and latency
+    
+    Returns one row per EF value. on_progress(done, total) is called after each search.
+    preprocessing is sent with every search, as for the ground truth.
+    """
+    rows = []
+    total = len(ef_values) * len(vectors)
+    done = 0
+    for ef in ef_values:
+        payloads = (
+            (i, {
+                "collection_name": collection_name,
+                "limit": k,
+                "score_all_documents": False,
+                "use_native_search": True,
+                "hnsw": {"ef_construction": ef},
+                "preprocessing": preprocessing or {},
+                "query_vector": vector.tolist(),
+            })
+            for i, vector in enumerate(vectors)
+        )
+        latencies, recalls, failed = [], [], 0
+        start_time = time.time()
+        for i, result, latency, error in search_many(payloads, max_in_flight):
+            done += 1
+            if on_progress:
+                on_progress(done, total)
+            if error is not None:
+                failed += 1
+                continue
+            latencies.append(latency)
+            recall = recall_at_k(truth[i], result_keys(result, key_by), k)
+            if recall is not None:
+                recalls.append(recall)
+        wall_time = time.time() - start_time
+        
+        latency = latency_summary(latencies)
+        rows.append({
+            "ef": ef,
+            f"recall@{k}": round(float(np.mean(recalls)), 4) if recalls else None,
+            "p50 (ms)": latency.get("p50"),
+            "p95 (ms)": latency.get("p95"),
+            "p99 (ms)": latency.get("p99"),
+            "QPS": round(len(latencies) / wall_time, 1) if wall_time else None,
+            "failed": failed,
+        })
+    return mark_frontier(pd.DataFrame(rows), f"recall@{k}", "p95 (ms)")
+
+def mark_frontier(frame, recall_column, latency_column):
+    """Flag the settings no other setting beats on both recall and latency"""
+    frontier = []
+    for _, row in frame.iterrows():
+        dominated = (
+            (frame[recall_column] >= row[recall_column]) & (frame[latency_column] <= row[latency_column])
+            & ((frame[recall_column] > row[recall_column]) | (frame[latency_column] < row[latency_column]))
+        ).any()
+        frontier.append(not dominated and pd.notna(row[recall_column]))
+    return frame.assign(frontier=frontier)
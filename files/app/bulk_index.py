@@ -0,0 +1,93 @@
+import hashlib
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import requests
+import api_client
+from app_config import APP_CONFIG
+
+# Bulk indexing settings (generated from the index_* Ansible variables)
+INDEX_CONFIG = APP_CONFIG.get("indexing", {})
+DEFAULT_CHUNK_SIZE = INDEX_CONFIG.get("chunk_size", 500)
+DEFAULT_MAX_IN_FLIGHT = INDEX_CONFIG.get("max_in_flight", 2)
+
+# Responses after which the chunk was certainly not indexed, so resending it is safe
+INDEX_RETRY_STATUS_CODES = {429, 503}
+
+def documents_fingerprint(documents):
+    """Digest of the texts and ids of a document list, used to match a resume checkpoint"""
+    digest = hashlib.blake2b(digest_size=16)
+    for document in documents:
+        digest.update(document["text"].encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(str(document.get("metadata", {}).get("id", "")).encode("utf-8"))
+        digest.update(b"\x01")
+    return digest.hexdigest()
+
+def post_index_chunk(url, params, payload, session=None):
+    """POST one chunk of documents, retrying 429/503 and connection errors with jittered backoff
+    
+    Indexing is not idempotent, so a read timeout or another 5xx is not retried:
+    the chunk may already have been indexed.
+    """
+    attempt = 0
+    while True:
+        try:
+            response = api_client.post(url, session=session, params=params, json=payload)
+        except requests.exceptions.ConnectionError:
+            # Includes ConnectTimeout but not ReadTimeout
+            if attempt >= api_client.MAX_RETRIES:
+                raise
+        else:
+            if response.status_code == 200:
+                return response.json()
+            if attempt >= api_client.MAX_RETRIES or response.status_code not in INDEX_RETRY_STATUS_CODES:
+                raise api_client.APIError(response.status_code, api_client.error_detail(response))
+        attempt += 1
+        time.sleep(api_client.backoff_delay(attempt))
+
+def index_chunks(url, params, chunks, base_payload, max_in_flight, first_chunk_payload=None):
+    """Index chunks of documents with at most max_in_flight requests outstanding
+    
+    chunks is an iterable of (chunk_index, documents) consumed lazily, so only the
+    chunks in flight are held in memory. The first chunk goes out alone, carrying
+    first_chunk_payload (e.g. tuning options), so the collection exists before
+    concurrent chunks arrive; if it fails, nothing else is sent. Yields
+    (chunk_index, documents, result, error) in completion order; error is None
+    on success.
+    """
+    session = api_client.get_session()
+    executor = ThreadPoolExecutor(max_workers=max_in_flight)
+    chunks = iter(chunks)
+    in_flight = {}
+    first = True
+    try:
+        while True:
+            while len(in_flight) < (1 if first else max_in_flight):
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                chunk_index, documents = chunk
+                payload = dict(base_payload, documents=documents)
+                if first and first_chunk_payload:
+                    payload.update(first_chunk_payload)
+                in_flight[executor.submit(post_index_chunk, url, params, payload, session)] = (chunk_index, documents)
+                if first:
+                    break
+            if not in_flight:
+                return
+            
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk_index, documents = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    yield chunk_index, documents, None, e
+                    if first:
+                        # The collection may not exist; fanning out would only fail or race
+                        return
+                    continue
+                yield chunk_index, documents, result, None
+            first = False
+    finally:
+        api_client.stop_executor(executor, in_flight)
@@ -0,0 +1,103 @@
+import re
+import numpy as np
+from dedup import text_fingerprint
+
+# Splitting modes: label -> (mode, size unit, default size, default overlap)
+SPLIT_MODES = {
+    "Off": (None, None, 0, 0),
+    "Fixed size": ("fixed", "characters", 1000, 100),
+    "Sentence": ("sentence", "characters", 1000, 1),
+    "Token budget": ("tokens", "tokens", 256, 32),
+}
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+TOKEN = re.compile(r"\w+|[^\w\s]")
+
+def split_fixed(text, size, overlap=0):
+    """Yield (offset, piece) windows of size characters, consecutive windows sharing overlap characters"""
+    step = max(size - overlap, 1)
+    for start in range(0, max(len(text) - overlap, 1), step):
+        piece = text[start:start + size]
+        if piece.strip():
+            yield start, piece
+
+def split_sentences(text, max_chars, overlap=0):
+    """Yield (offset, piece) runs of whole sentences up to max_chars, repeating overlap sentences
+    
+    A sentence longer than max_chars on its own is cut with split_fixed.
+    """
+    spans = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        spans.append((start, match.start()))
+        start = match.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    
+    first = 0
+    while first < len(spans):
+        last = first
+        while last + 1 < len(spans) and spans[last + 1][1] - spans[first][0] <= max_chars:
+            last += 1
+        begin, end = spans[first][0], spans[last][1]
+        if end - begin > max_chars:
+            for offset, piece in split_fixed(text[begin:end], max_chars):
+                yield begin + offset, piece
+        else:
+            yield begin, text[begin:end]
+        first = max(last + 1 - overlap, first + 1)
+
+def split_tokens(text, max_tokens, overlap=0):
+    """Yield (offset, piece) windows of at most max_tokens word/punctuation tokens"""
+    spans = [match.span() for match in TOKEN.finditer(text)]
+    step = max(max_tokens - overlap, 1)
+    for first in range(0, max(len(spans) - overlap, 1), step):
+        window = spans[first:first + max_tokens]
+        if window:
+            yield window[0][0], text[window[0][0]:window[-1][1]]
+
+SPLITTERS = {"fixed": split_fixed, "sentence": split_sentences, "tokens": split_tokens}
+
+def iter_split_documents(documents, mode, size, overlap=0, lengths=None):
+    """Lazily replace each document with child documents holding parts of its text
+    
+    Children keep the parent metadata plus parent_id, part and offset (character
+    position in the parent text). A child id of "<parent_id>:<part>" keeps ID
+    de-duplication from dropping siblings. Documents that fit in one part pass
+    through unchanged. Emitted text lengths are appended to lengths if given.
+    """
+    splitter = SPLITTERS.get(mode)
+    for doc in documents:
+        pieces = list(splitter(doc["text"], size, overlap)) if splitter else []
+        if len(pieces) <= 1:
+            if lengths is not None:
+                lengths.append(len(doc["text"]))
+            yield doc
+            continue
+        
+        metadata = doc.get("metadata", {})
+        parent_id = metadata.get("id")
+        if parent_id is None:
+            parent_id = text_fingerprint(doc["text"]).hex()
+        for part, (offset, piece) in enumerate(pieces):
+            if lengths is not None:
+                lengths.append(len(piece))
+            yield {
+                "text": piece,
+                "metadata": {**metadata, "id": f"{parent_id}:{part}", "parent_id": parent_id, "part": part, "offset": offset},
+            }
+
+def split_summary(lengths):
+    """Count and size distribution (characters) of split document texts"""
+    if not lengths:
+        return {"count": 0}
+    lengths = np.asarray(lengths)
+    p50, p95 = np.percentile(lengths, [50, 95])
+    return {
+        "count": int(lengths.size),
+        "min": int(lengths.min()),
+        "p50": int(p50),
+        "p95": int(p95),
+        "max": int(lengths.max()),
+        "mean": float(lengths.mean()),
+    }
@@ -0,0 +1,36 @@
+import hashlib
+from embed_cache import normalize_text
+
+def text_fingerprint(text):
+    """Compact digest of the normalized text, used to spot exact duplicates"""
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).digest()
+
+def iter_unique_documents(documents, by_text=False, by_id=False, counts=None):
+    """Yield documents whose text (and optionally metadata.id) has not been seen yet
+    
+    The first occurrence wins. Works lazily over any iterable, keeping only a set
+    of 16-byte digests and ids. When a counts dict is given, its "duplicate_text"
+    and "duplicate_id" entries are incremented for each skipped document.
+    """
+    seen_texts = set()
+    seen_ids = set()
+    if counts is not None:
+        counts.setdefault("duplicate_text", 0)
+        counts.setdefault("duplicate_id", 0)
+    for document in documents:
+        doc_id = document.get("metadata", {}).get("id") if by_id else None
+        if doc_id and doc_id in seen_ids:
+            if counts is not None:
+                counts["duplicate_id"] += 1
+            continue
+        fingerprint = text_fingerprint(document["text"]) if by_text else None
+        if fingerprint is not None and fingerprint in seen_texts:
+            if counts is not None:
+                counts["duplicate_text"] += 1
+            continue
+        
+        if doc_id:
+            seen_ids.add(doc_id)
+        if fingerprint is not None:
+            seen_texts.add(fingerprint)
+        yield document
@@ -0,0 +1,129 @@
+from collections import Counter
+import pandas as pd
+import streamlit as st
+
+# Characters of document text shown in the management table
+PREVIEW_LENGTH = 100
+
+TABLE_COLUMNS = ["id", "category", "length", "text"]
+
+def document_rows(documents):
+    """Build the management table rows for a list of documents"""
+    return pd.DataFrame(
+        [
+            (
+                str(doc.get("metadata", {}).get("id", "")),
+                str(doc.get("metadata", {}).get("category") or "Uncategorized"),
+                len(doc["text"]),
+                doc["text"][:PREVIEW_LENGTH],
+            )
+            for doc in documents
+        ],
+        columns=TABLE_COLUMNS,
+    )
+
+def init_document_state():
+    """Create the pending document list, its table and its aggregates in session state
+    
+    The table and aggregates are rebuilt only if they no longer match the list.
+    """
+    if "documents" not in st.session_state:
+        st.session_state.documents = []
+    table = st.session_state.get("documents_table")
+    if table is None or len(table) != len(st.session_state.documents):
+        _rebuild_document_state()
+
+def _rebuild_document_state():
+    """Recompute the table and aggregates from the document list in one pass"""
+    table = document_rows(st.session_state.documents)
+    st.session_state.documents_table = table
+    st.session_state.document_categories = Counter(table["category"])
+    st.session_state.documents_total_length = int(table["length"].sum())
+
+def add_documents(documents):
+    """Append documents to the pending list, updating the table and aggregates incrementally"""
+    if not documents:
+        return
+    rows = document_rows(documents)
+    st.session_state.documents.extend(documents)
+    st.session_state.documents_table = pd.concat([st.session_state.documents_table, rows], ignore_index=True)
+    st.session_state.document_categories.update(rows["category"])
+    st.session_state.documents_total_length += int(rows["length"].sum())
+
+def remove_documents(positions):
+    """Remove the documents at the given list positions"""
+    positions = set(positions)
+    if not positions:
+        return
+    table = st.session_state.documents_table
+    removed = table.iloc[sorted(positions)]
+    st.session_state.documents = [doc for i, doc in enumerate(st.session_state.documents) if i not in positions]
+    st.session_state.documents_table = table.drop(index=removed.index).reset_index(drop=True)
+    st.session_state.document_categories.subtract(removed["category"])
+    st.session_state.document_categories += Counter()  # Drop categories that reached zero
+    st.session_state.documents_total_length -= int(removed["length"].sum())
+
+def clear_documents():
+    """Empty the pending document list"""
+    st.session_state.documents = []
+    _rebuild_document_state()
+
+def document_stats():
+    """Document count, category count and average length from the maintained aggregates"""
+    count = len(st.session_state.documents)
+    categories = st.session_state.document_categories
+    return {
+        "count": count,
+        "categories": len(categories) - ("Uncategorized" in categories),
+        "avg_length": st.session_state.documents_total_length / count if count else 0,
+    }
+
+def render_document_table(page_size=50):
+    """Show one page of the pending documents with category filtering, inspection and removal"""
+    table = st.session_state.documents_table
+    
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        categories = sorted(st.session_state.document_categories)
+        selected_filter = st.selectbox("Filter by category", ["All"] + categories)
+    
+    if selected_filter != "All":
+        table = table[table["category"] == selected_filter]
+    
+    with col2:
+        page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=[25, 50, 100, 250].index(page_size))
+    with col3:
+        pages = max((len(table) + page_size - 1) // page_size, 1)
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1)
+    
+    # Only the visible page is handed to the browser
+    page_rows = table.iloc[(page - 1) * page_size:page * page_size]
+    st.caption(f"Showing {len(page_rows)} of {len(table)} documents (page {page} of {pages})")
+    edited = st.data_editor(
+        page_rows.assign(remove=False),
+        column_config={
+            "remove": st.column_config.CheckboxColumn("Remove", default=False),
+            "text": st.column_config.TextColumn("Text", width="large"),
+        },
+        disabled=TABLE_COLUMNS,
+        use_container_width=True,
+        key=f"documents_editor_{selected_filter}_{page}_{page_size}",
+    )
+    
+    selected = edited.index[edited["remove"]].tolist()
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        if st.button(f"Remove {len(selected)} Selected", disabled=not selected):
+            remove_documents(selected)
+            st.rerun()
+    with col2:
+        if len(page_rows):
+            position = st.selectbox(
+                "Inspect document", page_rows.index.tolist(),
+                format_func=lambda i: f"{i + 1}: {table.at[i, 'text'][:50]}"
+            )
+            with st.expander("Document details"):
+                document = st.session_state.documents[position]
+                st.write(f"**Text**: {document['text']}")
+                st.write("**Metadata**:")
+                st.json(document.get("metadata", {}))
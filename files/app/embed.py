@@ -1,10 +1,23 @@
 import streamlit as st
-import requests
 import json
 import numpy as np
 import pandas as pd
 import time
-from utils import EMBED_API, card_container, render_stats
+import io
+import os
+from collections import deque
+from itertools import islice
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import api_client
+from app_config import APP_CONFIG
+from batching import AdaptiveBatchSizer, is_backoff_status, padded_cost, sort_by_length
+from embed_cache import cache_key, get_embedding_cache
+from embed_stream import OUTPUT_FORMATS, Artifact, EmbeddingSpool, csv_columns, iter_upload_texts
+from utils import EMBED_API, card_container, iter_chunks, job_fingerprint, render_stats
+
+# Embedding dispatch settings (generated from the embed_* Ansible variables)
+EMBED_CONFIG = APP_CONFIG.get("embedding", {})
+DEFAULT_MAX_IN_FLIGHT = EMBED_CONFIG.get("max_in_flight", 4)
 
 def render_embed_tab():
     """Render the Create Embeddings tab with dark theme styling"""
@@ -51,7 +64,7 @@ def render_embed_tab():
                 st.markdown("**Embedding Visualization:**")
                 
                 # Create a heatmap of the embedding
-                embedding_array = np.array(item['embedding'])
+                embedding_array = item['embedding']
                 
                 # Reshape for visualization if it's a large embedding
                 vis_width = min(16, len(embedding_array))
@@ -75,82 +88,181 @@ def render_embed_tab():
                 st.markdown("</div>", unsafe_allow_html=True)
                 st.caption("Showing a snippet of the embedding values as a heatmap visualization.")
                 
-                # Download option
-                st.download_button(
-                    label="Download Full Embedding",
-                    data=json.dumps({"text": item['text'], "embedding": item['embedding']}),
-                    file_name=f"embedding_{i+1}.json",
-                    mime="application/json"
-                )
+                # Download options
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.download_button(
+                        label="Download Full Embedding",
+                        data=json.dumps({"text": item['text'], "embedding": item['embedding'].tolist()}),
+                        file_name=f"embedding_{i+1}.json",
+                        mime="application/json",
+                        key=f"download_embedding_json_{i}"
+                    )
+                with col2:
+                    st.download_button(
+                        label="Download as .npy",
+                        data=embeddings_to_npy(item['embedding']),
+                        file_name=f"embedding_{i+1}.npy",
+                        mime="application/octet-stream",
+                        key=f"download_embedding_npy_{i}"
+                    )
 
 def embedding_card_content():
     """Content for the embedding creation card"""
     # Option to input multiple texts
     text_input_method = st.radio(
         "Input method",
-        ["Single text", "Multiple texts (one per line)"],
+        ["Single text", "Multiple texts (one per line)", "Upload file (TXT/CSV/JSONL)"],
         horizontal=True
     )
     
+    uploaded_file = None
     if text_input_method == "Single text":
         input_text = st.text_area("Enter text to embed", height=150, 
                                 placeholder="Enter the text you want to convert to a vector embedding...")
         texts_to_embed = [input_text] if input_text else []
-    else:
+    elif text_input_method == "Multiple texts (one per line)":
         input_texts = st.text_area("Enter texts to embed (one per line)", height=150,
                                   placeholder="Enter multiple texts, one per line...\nEach line will be converted to a separate embedding.")
         texts_to_embed = [text.strip() for text in input_texts.split('\n') if text.strip()]
+    else:
+        # Large files are streamed in chunks instead of being loaded into a text area
+        texts_to_embed = []
+        uploaded_file = st.file_uploader("Choose a file to embed", type=["txt", "csv", "jsonl"],
+                                         help="TXT: one text per line. CSV: pick the text column. JSONL: one JSON object per line.")
+        if uploaded_file is not None:
+            file_type = uploaded_file.name.rsplit(".", 1)[-1].lower()
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                text_field = None
+                if file_type == "csv":
+                    text_field = st.selectbox("Text column", csv_columns(uploaded_file))
+                elif file_type == "jsonl":
+                    text_field = st.text_input("Text field", value="text", help="Key holding the text in each JSON object")
+            with col2:
+                stream_chunk_size = st.number_input(
+                    "Stream Chunk Size", min_value=100, max_value=100000, value=1000, step=100,
+                    help="Texts read from the file and embedded per chunk"
+                )
+            with col3:
+                output_format = st.selectbox("Output format", list(OUTPUT_FORMATS))
     
-    col1, col2 = st.columns([3, 1])
+    col1, col2, col3 = st.columns([2, 1, 1])
     with col1:
         generate_button = st.button(
             "Generate Embeddings", 
             type="primary",
             use_container_width=True,
-            disabled=not texts_to_embed
+            disabled=not texts_to_embed and uploaded_file is None
+        )
+    with col2:
+        batch_size = st.number_input("Batch Size", min_value=1, max_value=100, value=10,
+                                     help="Texts per request; the starting size when auto batch size is on")
+    with col3:
+        max_in_flight = st.number_input(
+            "Concurrent Batches", min_value=1, max_value=32, value=DEFAULT_MAX_IN_FLIGHT,
+            help="Number of batch requests kept in flight at once"
+        )
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        use_cache = st.checkbox(
+            "Use embedding cache",
+            value=True,
+            help="Reuse embeddings of texts seen before; only uncached texts are sent to the API"
         )
     with col2:
-        batch_size = st.number_input("Batch Size", min_value=1, max_value=100, value=10)
+        auto_batch = st.checkbox(
+            "Auto batch size",
+            value=False,
+            help="Grow or shrink batches toward a target latency, backing off on 413/429/5xx responses"
+        )
+    with col3:
+        bucket_by_length = st.checkbox(
+            "Bucket by length",
+            value=False,
+            help="Batch texts of similar length together to cut padding; output order is unchanged"
+        )
+    
+    target_latency = None
+    if auto_batch:
+        target_latency = st.slider(
+            "Target batch latency (seconds)",
+            min_value=0.1, max_value=10.0, value=1.0, step=0.1,
+            help="Latency per batch request that auto batch size aims for"
+        )
+    
+    # Offer to resume an interrupted or partially failed run over the same input
+    resume_button = False
+    if uploaded_file is not None:
+        stream_checkpoint = st.session_state.get("embed_stream_checkpoint")
+        if stream_checkpoint and stream_checkpoint["job_id"] == job_fingerprint(
+                uploaded_file.name, uploaded_file.size, file_type, text_field, output_format):
+            resume_button = st.button(
+                f"Resume interrupted run ({stream_checkpoint['consumed']} texts already written)",
+                use_container_width=True
+            )
+    elif texts_to_embed:
+        checkpoint = st.session_state.get("embed_checkpoint")
+        if checkpoint and checkpoint["job_id"] == job_fingerprint(*texts_to_embed):
+            resume_button = st.button(
+                f"Resume interrupted run ({checkpoint_progress(checkpoint)}/{len(texts_to_embed)} texts done)",
+                use_container_width=True
+            )
     
-    if generate_button:
-        if texts_to_embed:
+    if generate_button or resume_button:
+        sizer = AdaptiveBatchSizer(batch_size, target_latency) if auto_batch else None
+        if uploaded_file is not None:
+            run_streaming_job(
+                uploaded_file, file_type, text_field, stream_chunk_size, output_format,
+                batch_size, max_in_flight, use_cache, sizer, resume=resume_button, bucket=bucket_by_length
+            )
+        elif texts_to_embed:
+            # The checkpoint lives in session state and is filled in as batches
+            # complete, so it survives a rerun that interrupts this one
+            if not resume_button:
+                checkpoint = new_checkpoint(job_fingerprint(*texts_to_embed), len(texts_to_embed))
+                st.session_state.embed_checkpoint = checkpoint
+            
             with st.spinner(f"Generating embeddings for {len(texts_to_embed)} text(s)..."):
                 # Progress bar
                 progress_bar = st.progress(0)
                 
-                # Use batching for multiple texts
-                all_embeddings = []
-                total_batches = (len(texts_to_embed) + batch_size - 1) // batch_size
-                
                 start_time = time.time()
                 
-                for i in range(0, len(texts_to_embed), batch_size):
-                    batch = texts_to_embed[i:i + batch_size]
-                    
-                    # Update progress
-                    progress = (i / len(texts_to_embed)) if len(texts_to_embed) > 0 else 0
-                    progress_bar.progress(progress)
-                    
-                    try:
-                        response = requests.post(EMBED_API, json=batch)
-                        
-                        if response.status_code == 200:
-                            result = response.json()
-                            batch_embeddings = result.get("embeddings", [])
-                            all_embeddings.extend(batch_embeddings)
-                        else:
-                            st.error(f"Error in batch {i//batch_size + 1}: {response.status_code} - {response.text}")
-                            break
-                    except Exception as e:
-                        st.error(f"Error in batch {i//batch_size + 1}: {str(e)}")
-                        break
+                def update_progress(completed_texts):
+                    # Update progress as batches actually complete
+                    elapsed = time.time() - start_time
+                    rate = completed_texts / elapsed if elapsed > 0 else 0
+                    progress_bar.progress(
+                        completed_texts / len(texts_to_embed),
+                        text=f"{completed_texts}/{len(texts_to_embed)} texts ({rate:.1f} texts/sec)"
+                    )
+                
+                all_embeddings, run_stats = embed_texts(
+                    texts_to_embed, batch_size, max_in_flight, use_cache, update_progress, sizer, checkpoint,
+                    bucket=bucket_by_length
+                )
+                if run_stats["error"] and not run_stats["completed"]:
+                    st.error(f"{run_stats['error']} No texts were embedded; use Resume to retry them.")
+                elif run_stats["error"]:
+                    st.error(f"{run_stats['error']} The other {len(run_stats['completed'])} texts were embedded; "
+                             "use Resume to retry the missing ones.")
+                else:
+                    del st.session_state.embed_checkpoint
+                render_batch_status(run_stats["batch_status"])
+                if run_stats["duplicates"]:
+                    st.caption(f"{run_stats['duplicates']} duplicate texts were embedded once and reused.")
+                embedded_texts = [texts_to_embed[position] for position in run_stats["completed"]]
                 
                 # Complete progress bar
                 progress_bar.progress(1.0)
                 
                 # Calculate processing time
                 total_time = time.time() - start_time
-                texts_per_second = len(texts_to_embed) / total_time if total_time > 0 else 0
+                # Rows checkpointed by an earlier run were already counted then
+                new_embeddings = len(all_embeddings) - run_stats["resumed"]
+                texts_per_second = new_embeddings / total_time if total_time > 0 else 0
                 
                 # Update session state
                 if 'embeddings_history' not in st.session_state:
@@ -158,10 +270,11 @@ def embedding_card_content():
                 
                 # Store only the first few embeddings in history to avoid memory issues
                 max_history = 5
-                for i, (text, embedding) in enumerate(zip(texts_to_embed[:max_history], all_embeddings[:max_history])):
+                for i, (text, embedding) in enumerate(zip(embedded_texts[:max_history], all_embeddings[:max_history])):
                     st.session_state.embeddings_history.append({
                         'text': text,
-                        'embedding': embedding
+                        # Copy the row so history does not keep the whole batch matrix alive
+                        'embedding': embedding.copy()
                     })
                 
                 # Keep history at a reasonable size
@@ -169,13 +282,15 @@ def embedding_card_content():
                     st.session_state.embeddings_history = st.session_state.embeddings_history[-max_history:]
                 
                 # Update total embeddings count
-                st.session_state.total_embeddings += len(all_embeddings)
+                st.session_state.total_embeddings += new_embeddings
                 
                 # Show success message
-                st.success(f"Successfully generated {len(all_embeddings)} embeddings in {total_time:.2f} seconds ({texts_per_second:.1f} texts/sec)")
+                if not run_stats["error"]:
+                    st.success(f"Successfully generated {len(all_embeddings)} embeddings in {total_time:.2f} seconds "
+                               f"({texts_per_second:.1f} texts/sec)")
                 
                 # Display embedding info
-                if all_embeddings:
+                if len(all_embeddings):
                     col1, col2, col3 = st.columns(3)
                     
                     with col1:
@@ -186,7 +301,7 @@ def embedding_card_content():
                         )
                     
                     with col2:
-                        embedding_dim = len(all_embeddings[0]) if all_embeddings else 0
+                        embedding_dim = all_embeddings.shape[1]
                         render_stats(
                             "Vector Dimension", 
                             embedding_dim,
@@ -200,13 +315,442 @@ def embedding_card_content():
                             f"Total time: {total_time:.2f}s"
                         )
                     
-                    # Option to download all embeddings
-                    st.download_button(
-                        label="Download All Embeddings",
-                        data=json.dumps({"embeddings": all_embeddings, "texts": texts_to_embed}),
-                        file_name="embeddings_batch.json",
-                        mime="application/json",
-                        use_container_width=True
-                    )
+                    # Cache effectiveness for this run
+                    if use_cache:
+                        full_batches = (len(texts_to_embed) + batch_size - 1) // batch_size
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            render_stats(
+                                "Cache Hits",
+                                f"{run_stats['cache_hits']}/{len(texts_to_embed)}",
+                                f"{run_stats['misses'] - run_stats['duplicates']} unique misses sent to the API"
+                            )
+                        with col2:
+                            render_stats(
+                                "API Calls Saved",
+                                max(full_batches - run_stats['batches'], 0),
+                                f"{run_stats['batches']} of {full_batches} batch requests made"
+                            )
+                    
+                    if sizer:
+                        render_batch_report(sizer)
+                    if bucket_by_length:
+                        render_bucketing_gain(run_stats)
+                    
+                    # Option to download all embeddings: binary float32 formats are ~10x smaller than JSON
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.download_button(
+                            label="Download All Embeddings (.npz)",
+                            data=embeddings_to_npz(embedded_texts, all_embeddings),
+                            file_name="embeddings_batch.npz",
+                            mime="application/octet-stream",
+                            help="Texts and the float32 embedding matrix in one NumPy archive",
+                            use_container_width=True
+                        )
+                    with col2:
+                        st.download_button(
+                            label="Download Matrix (.npy)",
+                            data=embeddings_to_npy(all_embeddings),
+                            file_name="embeddings_batch.npy",
+                            mime="application/octet-stream",
+                            help="The float32 embedding matrix only, one row per embedded text. Texts that failed are "
+                                 "left out, so use the .npz to match rows to texts after a partial run",
+                            use_container_width=True
+                        )
+                    with col3:
+                        st.download_button(
+                            label="Download All Embeddings (JSON)",
+                            data=json.dumps({"embeddings": all_embeddings.tolist(), "texts": embedded_texts}),
+                            file_name="embeddings_batch.json",
+                            mime="application/json",
+                            use_container_width=True
+                        )
         else:
-            st.warning("Please enter text to embed")
\ No newline at end of file
+            st.warning("Please enter text to embed")
+    
+    # Finished streaming artifacts survive reruns until replaced; the file is read only when asked for
+    artifact = st.session_state.get("embedding_artifact")
+    if artifact and artifact.exists():
+        size_mb = os.path.getsize(artifact.path) / (1024 * 1024)
+        if st.checkbox(f"Prepare download of {artifact.count} streamed embeddings ({size_mb:.1f} MB)", value=False):
+            with open(artifact.path, "rb") as artifact_file:
+                st.download_button(
+                    label=f"Download {artifact.count} Streamed Embeddings ({artifact.file_name})",
+                    data=artifact_file,
+                    file_name=artifact.file_name,
+                    mime=artifact.mime,
+                    use_container_width=True
+                )
+
+def run_streaming_job(uploaded_file, file_type, text_field, chunk_size, output_format, batch_size, max_in_flight, use_cache, sizer=None, resume=False, bucket=False):
+    """Embed a large upload chunk by chunk, spooling results to a temp file
+    
+    Only one chunk of texts and embeddings is held in memory at a time. Progress is
+    checkpointed in session state after every chunk. If a chunk still has failed
+    batches after retries, the run stops and can later be resumed from the first
+    text that was not written. The artifact's path is kept in session state for
+    download.
+    """
+    job_id = job_fingerprint(uploaded_file.name, uploaded_file.size, file_type, text_field, output_format)
+    checkpoint = st.session_state.get("embed_stream_checkpoint")
+    if not resume or not checkpoint or checkpoint["job_id"] != job_id:
+        if checkpoint:
+            checkpoint["spool"].close()
+        checkpoint = {
+            "job_id": job_id,
+            "consumed": 0,
+            "spool": EmbeddingSpool(output_format),
+            "history": [],
+            "stats": {"cache_hits": 0, "misses": 0, "duplicates": 0, "batches": 0, "padded_chars": 0, "padded_chars_unbucketed": 0},
+        }
+        st.session_state.embed_stream_checkpoint = checkpoint
+    spool = checkpoint["spool"]
+    total_stats = checkpoint["stats"]
+    history = checkpoint["history"]
+    
+    progress_bar = st.progress(0)
+    texts = islice(iter_upload_texts(uploaded_file, file_type, text_field), checkpoint["consumed"], None)
+    error = None
+    start_count = spool.count
+    start_time = time.time()
+    
+    with st.spinner(f"Streaming embeddings for {uploaded_file.name}..."):
+        for chunk in iter_chunks(texts, chunk_size):
+            matrix, stats = embed_texts(chunk, batch_size, max_in_flight, use_cache, sizer=sizer, bucket=bucket)
+            for key in total_stats:
+                total_stats[key] += stats[key]
+            
+            written = len(chunk)
+            if stats["failed"]:
+                # Only the texts before the first failure are written, so the output keeps input order
+                written = 0
+                while written < len(stats["completed"]) and stats["completed"][written] == written:
+                    written += 1
+            spool.write(chunk[:written], matrix[:written])
+            checkpoint["consumed"] += written
+            
+            # Keep a few samples for the Recent Embeddings view
+            for text, embedding in zip(chunk, matrix[:min(written, 5 - len(history))]):
+                history.append({'text': text, 'embedding': embedding.copy()})
+            
+            # Progress follows the read position in the uploaded file
+            elapsed = time.time() - start_time
+            rate = (spool.count - start_count) / elapsed if elapsed > 0 else 0
+            progress_bar.progress(
+                min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0),
+                text=f"{spool.count} texts embedded ({rate:.1f} texts/sec)"
+            )
+            
+            if stats["error"]:
+                error = stats["error"]
+                break
+    
+    progress_bar.progress(1.0)
+    total_time = time.time() - start_time
+    texts_per_second = (spool.count - start_count) / total_time if total_time > 0 else 0
+    
+    # Replace any previous artifact
+    previous = st.session_state.get("embedding_artifact")
+    if previous:
+        previous.remove()
+    st.session_state.embedding_artifact = Artifact(
+        spool.finalize(),
+        uploaded_file.name.rsplit(".", 1)[0] + "_embeddings" + spool.suffix,
+        OUTPUT_FORMATS[output_format]["mime"],
+        spool.count
+    )
+    
+    st.session_state.total_embeddings += spool.count - start_count
+    
+    if error:
+        st.error(f"{error} The download contains the {spool.count} embeddings completed before the failure; "
+                 "use Resume to continue from there.")
+    else:
+        # The run finished: drop the checkpoint and its spool
+        spool.close()
+        del st.session_state.embed_stream_checkpoint
+        st.session_state.embeddings_history = (st.session_state.get("embeddings_history", []) + history)[-5:]
+        st.success(f"Successfully generated {spool.count} embeddings in {total_time:.2f} seconds ({texts_per_second:.1f} texts/sec)")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        render_stats("Embeddings Created", spool.count, f"from {uploaded_file.name}")
+    with col2:
+        render_stats("Vector Dimension", spool.dim or 0, "elements per vector")
+    with col3:
+        render_stats(
+            "Cache Hits",
+            f"{total_stats['cache_hits']}/{total_stats['cache_hits'] + total_stats['misses']}",
+            f"{total_stats['batches']} batch requests made, {total_stats['duplicates']} duplicates reused"
+        )
+    
+    if sizer:
+        render_batch_report(sizer)
+    if bucket:
+        render_bucketing_gain(total_stats)
+
+def render_bucketing_gain(stats):
+    """Show the estimated padding removed by length bucketing"""
+    if not stats["padded_chars"] or not stats["padded_chars_unbucketed"]:
+        return
+    saved = 1 - stats["padded_chars"] / stats["padded_chars_unbucketed"]
+    render_stats(
+        "Estimated Padding Reduction",
+        f"{saved:.0%}",
+        f"{stats['padded_chars']:,} vs {stats['padded_chars_unbucketed']:,} padded chars for the same batch sizes in "
+        "input order (an estimate, not measured throughput)"
+    )
+
+def render_batch_status(batch_status):
+    """Show per-batch status when any batch needed a retry"""
+    if any(status["attempt"] > 1 or status["status"] != "done" for status in batch_status):
+        with st.expander("Batch status"):
+            st.dataframe(pd.DataFrame(batch_status), use_container_width=True, hide_index=True)
+
+def render_batch_report(sizer):
+    """Report the batch size chosen by auto batch sizing and its throughput curve"""
+    if not sizer.history:
+        return
+    history = pd.DataFrame(sizer.history).set_index("batch")
+    backoffs = int((history["status"] != 200).sum())
+    st.markdown(f"**Auto batch size:** settled on **{sizer.size}** texts per batch "
+                f"after {len(history)} batches ({backoffs} back-offs)")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.caption("Batch size per request")
+        st.line_chart(history["batch_size"], height=200)
+    with col2:
+        st.caption("Throughput per request (texts/sec)")
+        st.line_chart(history["texts_per_sec"], height=200)
+
+def embed_texts(texts, batch_size, max_in_flight, use_cache=True, on_progress=None, sizer=None, checkpoint=None, bucket=False):
+    """Embed texts through the cache and the batched API
+    
+    Returns (embeddings, stats): a float32 matrix with one row per completed text,
+    in input order, and a dict with cache/batch counts, the completed positions,
+    per-batch status and a summary of any failures. on_progress is called with the
+    number of completed texts after each batch.
+    
+    Failed batches are retried with jittered exponential backoff, up to
+    api_client.MAX_RETRIES times, while the rest of the run continues. With an
+    AdaptiveBatchSizer, batches are cut at the sizer's current size, and
+    413/429/5xx responses shrink the batches that are retried. A checkpoint from
+    new_checkpoint() is filled in as batches complete. Passing it again resumes
+    the run from the texts that were still missing. With bucket=True, the misses
+    are sent in length order so each batch pads to a similar length. Duplicate
+    texts, compared by cache key, are sent once and fanned back out.
+    """
+    embeddings = checkpoint["embeddings"] if checkpoint else [None] * len(texts)
+    resumed = sum(embedding is not None for embedding in embeddings)
+    
+    # Look up cached embeddings; only the misses go to the API
+    cache = get_embedding_cache()
+    keys = [cache_key(text) for text in texts]
+    lookup_keys = [key for key, embedding in zip(keys, embeddings) if embedding is None]
+    cached = cache.get_many(lookup_keys) if use_cache else {}
+    for position, key in enumerate(keys):
+        if embeddings[position] is None and key in cached:
+            embeddings[position] = cached[key]
+    miss_positions = [position for position, embedding in enumerate(embeddings) if embedding is None]
+    cache_hits = len(texts) - resumed - len(miss_positions)
+    
+    # Collapse duplicates: the first position of each key is sent and stands in for the rest
+    duplicates = {}
+    for position in miss_positions:
+        duplicates.setdefault(keys[position], []).append(position)
+    unique_positions = [positions[0] for positions in duplicates.values()]
+    
+    if bucket and unique_positions:
+        unique_positions = sort_by_length(unique_positions, [len(text) for text in texts])
+    
+    # Batches are cut lazily so their size can change mid-run; retries go out first
+    pending = deque(unique_positions)
+    retry_queue = deque()
+    batch_positions = []
+    batch_status = []
+    # After a 429/5xx, nothing is dispatched until the backoff delay has passed
+    throttle = {"until": 0.0}
+    
+    def next_batch():
+        size = sizer.size if sizer else batch_size
+        if retry_queue:
+            positions, attempt = retry_queue.popleft()
+            if len(positions) > size:
+                retry_queue.appendleft((positions[size:], attempt))
+                positions = positions[:size]
+        elif pending:
+            positions, attempt = [pending.popleft() for _ in range(min(size, len(pending)))], 0
+        else:
+            return None
+        batch_positions.append(positions)
+        batch_status.append({"batch": len(batch_positions), "texts": len(positions), "attempt": attempt + 1, "status": "in flight", "error": ""})
+        delay = max(api_client.backoff_delay(attempt), throttle["until"] - time.time(), 0.0)
+        return len(batch_positions) - 1, [texts[position] for position in positions], delay
+    
+    completed_texts = len(texts) - len(miss_positions)
+    failed_texts = 0
+    for batch_index, batch_embeddings, latency, error in dispatch_batches(next_batch, max_in_flight):
+        positions = batch_positions[batch_index]
+        status = batch_status[batch_index]
+        if error is not None:
+            status_code = getattr(error, "status_code", None)
+            attempt = status["attempt"] - 1
+            status["error"] = str(error)
+            if sizer and is_backoff_status(status_code):
+                sizer.back_off(len(positions), status_code)
+            if is_backoff_status(status_code) and status_code != 413:
+                # Throttled or overloaded: the shrunken batch and everything after it wait first
+                throttle["until"] = max(throttle["until"], time.time() + api_client.backoff_delay(attempt + 1))
+            if status_code == 413 and len(positions) > 1:
+                # Too large rather than transient: split without spending a retry
+                status["status"] = "split"
+                half = len(positions) // 2
+                retry_queue.extend([(positions[:half], attempt), (positions[half:], attempt)])
+            elif attempt < api_client.MAX_RETRIES:
+                status["status"] = "retrying"
+                retry_queue.append((positions, attempt + 1))
+            else:
+                status["status"] = "failed"
+                failed_texts += sum(len(duplicates[keys[position]]) for position in positions)
+            continue
+        
+        status["status"] = "done"
+        for position, embedding in zip(positions, batch_embeddings):
+            for duplicate in duplicates[keys[position]]:
+                embeddings[duplicate] = embedding
+                completed_texts += 1
+        if use_cache:
+            cache.put_many(zip((keys[position] for position in positions), batch_embeddings))
+        if sizer:
+            sizer.observe(len(positions), latency, sum(len(texts[position].encode("utf-8")) for position in positions))
+        if on_progress:
+            on_progress(completed_texts)
+    
+    # Estimate the padded work of the batches actually sent versus the same batch sizes in input order
+    padded_chars = padded_chars_unbucketed = 0
+    if bucket:
+        sent = [positions for positions, status in zip(batch_positions, batch_status) if status["status"] == "done"]
+        sizes = [len(positions) for positions in sent]
+        padded_chars = padded_cost([len(texts[position]) for positions in sent for position in positions], sizes)
+        padded_chars_unbucketed = padded_cost(
+            [len(texts[position]) for position in sorted(position for positions in sent for position in positions)], sizes
+        )
+    
+    # Stack the completed rows, in input order, into one contiguous float32 matrix
+    completed = [position for position, embedding in enumerate(embeddings) if embedding is not None]
+    matrix = np.vstack([embeddings[position] for position in completed]) if completed else np.empty((0, 0), dtype=np.float32)
+    
+    error = None
+    if failed_texts:
+        failed_batches = [status for status in batch_status if status["status"] == "failed"]
+        error = (f"{len(failed_batches)} batch(es) covering {failed_texts} texts failed after "
+                 f"{api_client.MAX_RETRIES} retries. Last error: {failed_batches[-1]['error']}")
+    stats = {
+        "cache_hits": cache_hits,
+        "resumed": resumed,
+        "misses": len(miss_positions),
+        "duplicates": len(miss_positions) - len(unique_positions),
+        "batches": len(batch_positions),
+        "failed": len(texts) - len(completed),
+        "completed": completed,
+        "batch_status": batch_status,
+        "padded_chars": padded_chars,
+        "padded_chars_unbucketed": padded_chars_unbucketed,
+        "error": error,
+    }
+    return matrix, stats
+
+def new_checkpoint(job_id, total):
+    """Create a resumable checkpoint for an embedding run over total texts"""
+    return {"job_id": job_id, "embeddings": [None] * total}
+
+def checkpoint_progress(checkpoint):
+    """Number of texts already embedded in a checkpoint"""
+    return sum(embedding is not None for embedding in checkpoint["embeddings"])
+
+def request_embeddings(batch, session=None, delay=0):
+    """Send one batch of texts to the embedding API, returning (embeddings, latency in seconds)
+    
+    Retries wait out their backoff delay here, on the worker thread. A response
+    with fewer embeddings than texts is an error, so the batch is retried rather
+    than leaving rows silently missing.
+    """
+    if delay:
+        time.sleep(delay)
+    start_time = time.time()
+    response = api_client.post(EMBED_API, session=session, json=batch)
+    latency = time.time() - start_time
+    if response.status_code != 200:
+        raise api_client.APIError(response.status_code, response.text)
+    embeddings = np.asarray(response.json().get("embeddings", []), dtype=np.float32)
+    if len(embeddings) != len(batch):
+        raise ValueError(f"The API returned {len(embeddings)} embeddings for {len(batch)} texts")
+    return embeddings, latency
+
+def dispatch_batches(next_batch, max_in_flight):
+    """Keep up to max_in_flight embedding requests outstanding
+    
+    next_batch() is called whenever a slot frees up and returns (batch_index, texts,
+    delay), or None when nothing is pending, so callers can resize or re-queue
+    batches between completions. Yields (batch_index, embeddings, latency, error)
+    in completion order; error is None on success. Callers place results by index
+    to keep output order stable.
+    """
+    session = api_client.get_session()
+    executor = ThreadPoolExecutor(max_workers=max_in_flight)
+    in_flight = {}
+    try:
+        while True:
+            while len(in_flight) < max_in_flight:
+                batch = next_batch()
+                if batch is None:
+                    break
+                batch_index, batch_texts, delay = batch
+                in_flight[executor.submit(request_embeddings, batch_texts, session, delay)] = batch_index
+            if not in_flight:
+                return
+            
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch_index = in_flight.pop(future)
+                try:
+                    batch_embeddings, latency = future.result()
+                except Exception as e:
+                    yield batch_index, None, None, e
+                    continue
+                yield batch_index, batch_embeddings, latency, None
+    finally:
+        api_client.stop_executor(executor, in_flight)
+
+def embeddings_to_npy(matrix):
+    """Serialize an embedding vector or matrix to .npy bytes"""
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(matrix, dtype=np.float32))
+    return buffer.getvalue()
+
+def embeddings_to_npz(texts, matrix):
+    """Serialize texts and their embedding matrix to a single .npz archive
+    
+    Texts are stored as one UTF-8 byte blob plus row offsets, so the archive
+    grows with the total text length rather than with the longest text.
+    """
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.cumsum([0] + [len(text) for text in encoded], dtype=np.int64)
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        text_bytes=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        text_offsets=offsets,
+        embeddings=np.asarray(matrix, dtype=np.float32)
+    )
+    return buffer.getvalue()
+
+def npz_texts(archive):
+    """Texts of an .npz export (byte blob and offsets, or an older fixed-width texts array), or None"""
+    if "text_offsets" in archive.files:
+        blob, offsets = archive["text_bytes"].tobytes(), archive["text_offsets"].tolist()
+        return [blob[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+    if "texts" in archive.files:
+        return archive["texts"].tolist()
+    return None
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+import streamlit as st
+from app_config import APP_CONFIG
+from utils import EMBED_API
+
+# Cache settings (generated from the embed_cache_* Ansible variables)
+CACHE_CONFIG = APP_CONFIG.get("embedding_cache", {})
+DATA_DIR = APP_CONFIG.get("storage", {}).get("data_dir", "data")
+MODEL_ID = APP_CONFIG.get("embedding", {}).get("model_id", "default")
+
+# SQLite limits the number of bound parameters per statement
+SQL_CHUNK_SIZE = 500
+
+def normalize_text(text):
+    """Normalize text for cache lookups by trimming and collapsing whitespace"""
+    return " ".join(text.split())
+
+def cache_key(text, model_id=MODEL_ID):
+    """Content-addressed key for a text under a given embedding model"""
+    # The endpoint is part of the model identity: two backends may serve different models
+    identity = f"{model_id}\x00{EMBED_API}\x00{normalize_text(text)}"
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """Two-tier embedding cache: a bounded in-memory LRU in front of an optional SQLite store
+    
+    Vectors are kept as float32 arrays in memory and as raw float32 blobs on disk.
+    Safe to share across sessions and worker threads.
+    """
+    def __init__(self, max_entries, db_path=None):
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._db.commit()
+
+    def get_many(self, keys):
+        """Return a dict of key -> vector for every key found in either tier"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+            
+            missing = [key for key in dict.fromkeys(keys) if key not in found]
+            if self._db is not None and missing:
+                for i in range(0, len(missing), SQL_CHUNK_SIZE):
+                    chunk = missing[i:i + SQL_CHUNK_SIZE]
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        found[key] = vector
+                        self._remember(key, vector)
+        return found
+
+    def put_many(self, items):
+        """Store (key, vector) pairs in memory and, when enabled, on disk"""
+        items = [(key, np.asarray(vector, dtype=np.float32)) for key, vector in items]
+        with self._lock:
+            for key, vector in items:
+                self._remember(key, vector)
+            if self._db is not None and items:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for key, vector in items]
+                )
+                self._db.commit()
+
+    def _remember(self, key, vector):
+        """Insert into the LRU tier, evicting the least recently used entries"""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def __len__(self):
+        return len(self._memory)
+
+@st.cache_resource
+def get_embedding_cache():
+    """Return the process-wide embedding cache"""
+    db_path = os.path.join(DATA_DIR, "embedding_cache.sqlite3") if CACHE_CONFIG.get("persist", True) else None
+    return EmbeddingCache(CACHE_CONFIG.get("max_entries", 20000), db_path)
@@ -0,0 +1,131 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import weakref
+import numpy as np
+import pandas as pd
+
+# Results stay in memory up to this size before the spool rolls over to disk
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+# Output formats for streamed embedding runs
+OUTPUT_FORMATS = {
+    "NumPy matrix (.npy)": {"suffix": ".npy", "mime": "application/octet-stream"},
+    "JSON Lines (.jsonl)": {"suffix": ".jsonl", "mime": "application/jsonl"},
+}
+
+def iter_upload_texts(uploaded_file, file_type, text_field=None, csv_chunk_size=10000):
+    """Lazily yield the texts of an uploaded TXT, CSV or JSONL file, skipping blank entries"""
+    uploaded_file.seek(0)
+    if file_type == "csv":
+        for frame in pd.read_csv(uploaded_file, usecols=[text_field], chunksize=csv_chunk_size, dtype=str):
+            for text in frame[text_field].dropna():
+                if text.strip():
+                    yield text.strip()
+        return
+    
+    reader = io.TextIOWrapper(uploaded_file, encoding="utf-8", errors="replace")
+    try:
+        for line in reader:
+            if file_type == "jsonl":
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                text = record.get(text_field) if isinstance(record, dict) else None
+                if isinstance(text, str) and text.strip():
+                    yield text.strip()
+            elif line.strip():
+                yield line.strip()
+    finally:
+        # Detach so closing the wrapper does not close the uploaded file
+        reader.detach()
+
+def csv_columns(uploaded_file):
+    """Return the column names of an uploaded CSV without reading its rows"""
+    uploaded_file.seek(0)
+    columns = list(pd.read_csv(uploaded_file, nrows=0).columns)
+    uploaded_file.seek(0)
+    return columns
+
+class EmbeddingSpool:
+    """Write embedding results incrementally to a spooled temporary file
+    
+    Memory use stays bounded by SPOOL_MAX_MEMORY regardless of the number of rows.
+    For .npy output, raw float32 rows are spooled and the array header is written
+    once the final shape is known.
+    """
+    def __init__(self, output_format):
+        self.suffix = OUTPUT_FORMATS[output_format]["suffix"]
+        self.count = 0
+        self.dim = None
+        self._spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+
+    def write(self, texts, matrix):
+        """Append one chunk of texts and their float32 embedding rows"""
+        if not len(matrix):
+            return
+        if self.dim is None:
+            self.dim = matrix.shape[1]
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension changed from {self.dim} to {matrix.shape[1]}")
+        
+        # finalize() may have read the spool; always append at the end
+        self._spool.seek(0, io.SEEK_END)
+        if self.suffix == ".npy":
+            self._spool.write(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+        else:
+            lines = (json.dumps({"text": text, "embedding": row.tolist()}) + "\n" for text, row in zip(texts, matrix))
+            self._spool.write("".join(lines).encode("utf-8"))
+        self.count += len(matrix)
+
+    def finalize(self):
+        """Write the rows spooled so far to a temporary artifact file and return its path
+        
+        The spool stays open, so an interrupted run can keep appending and finalize again.
+        """
+        with tempfile.NamedTemporaryFile(delete=False, suffix=self.suffix) as output:
+            if self.suffix == ".npy":
+                np.lib.format.write_array_header_1_0(output, {
+                    "descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+                    "fortran_order": False,
+                    "shape": (self.count, self.dim or 0),
+                })
+            self._spool.seek(0)
+            shutil.copyfileobj(self._spool, output)
+        return output.name
+
+    def close(self):
+        """Release the spooled data"""
+        self._spool.close()
+
+class Artifact:
+    """A finalized artifact file offered for download
+    
+    The file is deleted by remove(), or when the artifact is garbage collected
+    along with the session state that held it.
+    """
+    def __init__(self, path, file_name, mime, count):
+        self.path = path
+        self.file_name = file_name
+        self.mime = mime
+        self.count = count
+        self._cleanup = weakref.finalize(self, _remove_file, path)
+    
+    def exists(self):
+        return os.path.exists(self.path)
+    
+    def remove(self):
+        """Delete the artifact file now"""
+        self._cleanup()
+
+def _remove_file(path):
+    """Delete a file if it is still there"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
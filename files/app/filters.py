@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+# Filter operators offered in the builder
+FILTER_OPERATORS = ["equals", "between", "in"]
+
+# Payload fields suggested in the builder
+FILTER_FIELDS = ["category", "source", "id"]
+
+def _parse_value(text):
+    """Read a range bound typed in the builder as a number when it looks like one"""
+    text = str(text).strip()
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+def _match_values(text):
+    """Values an equals/in entry may match: the typed string, plus its number when it looks like one
+    
+    Payload values such as "id": "123" are strings, others such as "year": 2024
+    are numbers, so both are accepted.
+    """
+    text = str(text).strip()
+    number = _parse_value(text)
+    return [text] if isinstance(number, str) else [text, number]
+
+def parse_conditions(rows):
+    """Turn builder rows (field, operator, value) into filter conditions
+    
+    "between" takes "min, max" (either side may be empty) and "in" takes a
+    comma-separated list. Returns (conditions, errors).
+    """
+    conditions, errors = [], []
+    for row in rows:
+        field, operator, value = row.get("field"), row.get("operator"), row.get("value")
+        if not field or not operator or value is None or str(value).strip() == "":
+            continue
+        if operator == "equals":
+            conditions.append({"field": field, "op": "eq", "values": _match_values(value)})
+        elif operator == "in":
+            values = [match for v in str(value).split(",") if v.strip() for match in _match_values(v)]
+            conditions.append({"field": field, "op": "in", "values": values})
+        elif operator == "between":
+            bounds = str(value).split(",")
+            if len(bounds) != 2:
+                errors.append(f"'{field} between {value}' needs two values: min, max")
+                continue
+            low, high = (_parse_value(bound) if bound.strip() else None for bound in bounds)
+            conditions.append({"field": field, "op": "range", "gte": low, "lte": high})
+    return conditions, errors
+
+def payload_filter(conditions):
+    """The filter object sent with a search request: every condition must match"""
+    must = []
+    for condition in conditions:
+        if condition["op"] in ("eq", "in"):
+            values = condition["values"]
+            match = {"value": values[0]} if len(values) == 1 else {"any": values}
+            must.append({"key": condition["field"], "match": match})
+        else:
+            bounds = {name: condition[name] for name in ("gte", "lte") if condition[name] is not None}
+            must.append({"key": condition["field"], "range": bounds})
+    return {"must": must}
+
+def filter_mask(frame, conditions):
+    """Vectorized evaluation of the conditions over a DataFrame of payload fields
+    
+    A field missing from the frame matches nothing.
+    """
+    mask = np.ones(len(frame), dtype=bool)
+    for condition in conditions:
+        if condition["field"] not in frame.columns:
+            return np.zeros(len(frame), dtype=bool)
+        column = frame[condition["field"]]
+        if condition["op"] in ("eq", "in"):
+            mask &= column.isin(condition["values"]).to_numpy()
+        else:
+            values = pd.to_numeric(column, errors="coerce") if _numeric_bounds(condition) else column
+            if condition["gte"] is not None:
+                mask &= (values >= condition["gte"]).fillna(False).to_numpy(dtype=bool)
+            if condition["lte"] is not None:
+                mask &= (values <= condition["lte"]).fillna(False).to_numpy(dtype=bool)
+    return mask
+
+def missing_fields(frame, conditions):
+    """Fields the conditions filter on that the frame has no column for"""
+    return sorted({condition["field"] for condition in conditions} - set(frame.columns))
+
+def _numeric_bounds(condition):
+    """Whether a range condition compares numbers rather than strings"""
+    return any(isinstance(condition[name], (int, float)) for name in ("gte", "lte"))
+
+def filter_results(results, conditions):
+    """Keep only the search results whose payload satisfies the conditions"""
+    if not conditions or not results:
+        return results
+    frame = pd.DataFrame([item.get("payload", {}) for item in results])
+    mask = filter_mask(frame, conditions)
+    return [item for item, keep in zip(results, mask) if keep]
@@ -1,8 +1,18 @@
 import streamlit as st
-import requests
 import json
 import numpy as np
-from utils import INDEX_API
+import pandas as pd
+from bulk_index import DEFAULT_CHUNK_SIZE, DEFAULT_MAX_IN_FLIGHT, documents_fingerprint, index_chunks
+from chunking import SPLIT_MODES, iter_split_documents, split_summary
+from dedup import iter_unique_documents
+from documents import add_documents, clear_documents, document_stats, init_document_state, render_document_table
+from ingest import (
+    TABLE_READ_ROWS, iter_table_documents, iter_upload_records, iter_valid_documents, table_columns, table_row_count
+)
+from lexical import get_keyword_index
+from manifest import get_index_manifest, iter_changed_documents
+from search_cache import get_search_cache
+from utils import INDEX_API, iter_chunks, job_fingerprint
 
 def render_index_tab():
     """Render the Index Documents tab"""
@@ -59,28 +69,119 @@ def render_index_tab():
                     value=False,
                     help="Store the tuning results for later use"
                 )
+        
+        # Bulk indexing options
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            chunk_size = st.number_input(
+                "Chunk Size", min_value=1, max_value=10000, value=DEFAULT_CHUNK_SIZE,
+                help="Documents sent per index request"
+            )
+            
+            skip_duplicate_texts = st.checkbox(
+                "Skip duplicate texts",
+                value=False,
+                help="Send each distinct text once; later documents with the same normalized text are skipped, "
+                     "even when their IDs or metadata differ"
+            )
+        
+        with col2:
+            max_in_flight = st.number_input(
+                "Concurrent Chunks", min_value=1, max_value=16, value=DEFAULT_MAX_IN_FLIGHT,
+                help="Number of chunk requests kept in flight at once"
+            )
+            
+            skip_duplicate_ids = st.checkbox(
+                "Skip duplicate IDs",
+                value=True,
+                help="Skip documents whose metadata.id already appeared earlier in this submission"
+            )
+        
+        # Splitting long documents into child documents
+        split_label = st.selectbox(
+            "Split Long Documents",
+            list(SPLIT_MODES),
+            help="Split each document into parts before indexing; parts keep parent_id, part and offset in metadata"
+        )
+        split_mode, split_unit, default_split_size, default_split_overlap = SPLIT_MODES[split_label]
+        split_size, split_overlap = 0, 0
+        if split_mode:
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                split_size = st.number_input(
+                    f"Part Size ({split_unit})", min_value=10, max_value=100000, value=default_split_size,
+                    help="Maximum size of each part"
+                )
+            
+            with col2:
+                split_overlap = st.number_input(
+                    "Overlap (sentences)" if split_mode == "sentence" else f"Overlap ({split_unit})",
+                    min_value=0, max_value=max(split_size - 1, 0), value=min(default_split_overlap, split_size - 1),
+                    help="Amount of text repeated between consecutive parts"
+                )
+        splitting = (split_mode, split_size, split_overlap)
+        
+        # Delta indexing against the local manifest
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            skip_unchanged = st.checkbox(
+                "Only send new or changed documents",
+                value=True,
+                help="Skip documents whose id and content match what was last indexed into this collection"
+            )
+        
+        with col2:
+            manifest = get_index_manifest()
+            st.caption(f"{manifest.count(collection_name)} documents recorded as indexed in '{collection_name}'")
+            if st.button("Forget Indexed Documents", help="Clear the manifest so the next run sends every document"):
+                manifest.forget(collection_name)
+                st.rerun()
+        
+        # Local keyword index used by hybrid search
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            update_keyword_index = st.checkbox(
+                "Update keyword index",
+                value=True,
+                help="Add indexed documents to the local BM25 index that hybrid search fuses with vector results"
+            )
+        
+        with col2:
+            keyword_index = get_keyword_index()
+            st.caption(f"{keyword_index.count(collection_name)} documents in the keyword index for '{collection_name}'")
+            if st.button("Clear Keyword Index", help="Remove this collection from the local keyword index"):
+                keyword_index.forget(collection_name)
+                st.rerun()
+    
+    tuning_options = None
+    if tune_parameters:
+        tuning_options = {
+            "tune_vector_space": tune_vector_space,
+            "tune_sample_size": tune_sample_size,
+            "apply_best_params": apply_best_params,
+            "store_tuning_results": store_tuning_results
+        }
     
     # Document input
     st.subheader("Add Documents")
     
     # Initialize documents in session state if not exists
-    if 'documents' not in st.session_state:
-        st.session_state.documents = []
+    init_document_state()
     
     # Stats dashboard for current documents
     if st.session_state.documents:
+        stats = document_stats()
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Documents Ready", len(st.session_state.documents))
+            st.metric("Documents Ready", stats["count"])
         with col2:
-            categories = set()
-            for doc in st.session_state.documents:
-                if doc.get('metadata', {}).get('category'):
-                    categories.add(doc['metadata']['category'])
-            st.metric("Categories", len(categories))
+            st.metric("Categories", stats["categories"])
         with col3:
-            avg_length = sum(len(doc.get('text', '')) for doc in st.session_state.documents) / len(st.session_state.documents) if st.session_state.documents else 0
-            st.metric("Avg. Document Length", f"{avg_length:.0f} chars")
+            st.metric("Avg. Document Length", f"{stats['avg_length']:.0f} chars")
     
     # Form for adding a document
     with st.form("add_document_form"):
@@ -131,7 +232,7 @@ def render_index_tab():
                         "text": doc_text,
                         "metadata": metadata
                     }
-                    st.session_state.documents.append(document)
+                    add_documents([document])
                     st.success("Document added!")
             else:
                 st.warning("Document text is required")
@@ -173,69 +274,126 @@ def render_index_tab():
         ]
         
         if st.button("Load Sample Data"):
-            st.session_state.documents.extend(sample_data)
+            add_documents(sample_data)
             st.success(f"Added {len(sample_data)} sample documents!")
             st.rerun()
         
-        uploaded_file = st.file_uploader("Choose a JSON file", type="json")
+        uploaded_file = st.file_uploader("Choose a JSON or JSONL file", type=["json", "jsonl"])
         if uploaded_file is not None:
-            try:
-                documents = json.load(uploaded_file)
-                if isinstance(documents, list):
-                    valid_docs = []
-                    invalid_docs = []
-                    
-                    for doc in documents:
-                        if isinstance(doc, dict) and "text" in doc and doc["text"].strip() and isinstance(doc.get("metadata", {}), dict):
-                            valid_docs.append(doc)
-                        else:
-                            invalid_docs.append(doc)
+            stream_upload = st.checkbox(
+                "Stream file directly to the index",
+                value=False,
+                help="Parse the file record by record and index it in chunks without adding it to the document list"
+            )
+            
+            if stream_upload:
+                if not collection_name:
+                    st.warning("Please enter a collection name")
+                elif st.button(f"Stream {uploaded_file.name} to the index", type="primary"):
+                    try:
+                        request = build_index_request(
+                            collection_name, m_param, ef_construction, tuning_options
+                        )
+                        counts = {}
+                        index_record_stream(
+                            collection_name, iter_upload_records(uploaded_file, counts), counts,
+                            (uploaded_file.name, uploaded_file.size),
+                            lambda: uploaded_file.tell() / max(uploaded_file.size, 1),
+                            request, chunk_size, max_in_flight, skip_duplicate_texts, skip_duplicate_ids, splitting,
+                            manifest if skip_unchanged else None, keyword_index if update_keyword_index else None
+                        )
+                    except ValueError as e:
+                        st.error(f"Invalid file: {str(e)}")
+                    except Exception as e:
+                        st.error(f"An error occurred: {str(e)}")
+            else:
+                try:
+                    counts = {}
+                    valid_docs = list(iter_valid_documents(iter_upload_records(uploaded_file, counts), counts))
                     
                     if valid_docs:
                         if st.button(f"Add {len(valid_docs)} valid documents from file"):
-                            st.session_state.documents.extend(valid_docs)
+                            add_documents(valid_docs)
                             st.success(f"Added {len(valid_docs)} documents from file!")
                             
-                            if invalid_docs:
-                                st.warning(f"Skipped {len(invalid_docs)} invalid documents")
+                            if counts["invalid"]:
+                                st.warning(f"Skipped {counts['invalid']} invalid documents")
                             
                             st.rerun()
                     else:
                         st.warning("No valid documents found in the file")
-                else:
-                    st.warning("The uploaded file does not contain a list of documents")
-            except json.JSONDecodeError:
-                st.error("Invalid JSON file")
+                except ValueError as e:
+                    st.error(f"Invalid file: {str(e)}")
+    
+    # Columnar upload
+    with st.expander("Upload CSV / Parquet Documents"):
+        st.write("Map a text column and metadata columns; rows are read in chunks and sent straight to the index.")
+        
+        table_file = st.file_uploader("Choose a CSV or Parquet file", type=["csv", "parquet"], key="table_upload")
+        if table_file is not None:
+            file_type = "parquet" if table_file.name.lower().endswith(".parquet") else "csv"
+            try:
+                columns = table_columns(table_file, file_type)
+                total_rows = table_row_count(table_file, file_type)
+            except Exception as e:
+                st.error(f"Could not read {table_file.name}: {str(e)}")
+                columns = []
+            
+            if columns:
+                col1, col2 = st.columns([1, 2])
+                with col1:
+                    text_column = st.selectbox("Text column", columns)
+                    read_rows = st.number_input(
+                        "Rows per read", min_value=100, max_value=1000000, value=TABLE_READ_ROWS, step=1000,
+                        help="Rows read from the file at a time"
+                    )
+                with col2:
+                    metadata_columns = st.multiselect(
+                        "Metadata columns",
+                        [column for column in columns if column != text_column],
+                        default=[column for column in columns if column != text_column],
+                        help="Columns copied into each document's metadata"
+                    )
+                
+                if total_rows is not None:
+                    st.caption(f"{total_rows} rows, {len(columns)} columns")
+                
+                if not collection_name:
+                    st.warning("Please enter a collection name")
+                elif st.button(f"Index {table_file.name}", type="primary"):
+                    try:
+                        request = build_index_request(collection_name, m_param, ef_construction, tuning_options)
+                        counts = {}
+                        records = iter_table_documents(table_file, file_type, text_column, metadata_columns, counts, read_rows)
+                        if total_rows:
+                            progress_fraction = lambda: counts.get("rows", 0) / total_rows
+                        else:
+                            progress_fraction = lambda: table_file.tell() / max(table_file.size, 1)
+                        index_record_stream(
+                            collection_name, records, counts,
+                            (table_file.name, table_file.size, text_column, metadata_columns),
+                            progress_fraction, request, chunk_size, max_in_flight,
+                            skip_duplicate_texts, skip_duplicate_ids, splitting,
+                            manifest if skip_unchanged else None, keyword_index if update_keyword_index else None
+                        )
+                    except Exception as e:
+                        st.error(f"An error occurred: {str(e)}")
     
     # Document management
     if st.session_state.documents:
         st.subheader("Document Management")
         
-        col1, col2 = st.columns([3, 1])
+        col1, col2 = st.columns(2)
         
         with col1:
-            # Add filtering options
-            if len(st.session_state.documents) > 5:
-                filter_options = ["All"]
-                # Get unique categories
-                categories = set()
-                for doc in st.session_state.documents:
-                    cat = doc['metadata'].get('category', 'Uncategorized')
-                    categories.add(cat)
-                
-                filter_options.extend(sorted(categories))
-                selected_filter = st.selectbox("Filter by category", filter_options)
-            else:
-                selected_filter = "All"
-        
-        with col2:
             # Document management buttons
             if st.button("Clear All Documents"):
-                st.session_state.documents = []
+                clear_documents()
                 st.rerun()
-            
-            # Export documents option
-            if st.download_button(
+        
+        with col2:
+            # Export documents option, serialized only when asked for
+            if st.checkbox("Prepare export", value=False) and st.download_button(
                 "Export Documents",
                 data=json.dumps(st.session_state.documents, indent=2),
                 file_name="documents.json",
@@ -243,24 +401,19 @@ def render_index_tab():
             ):
                 st.success(f"Exported {len(st.session_state.documents)} documents")
         
-        # Display documents
-        for i, doc in enumerate(st.session_state.documents):
-            category = doc['metadata'].get('category', 'Uncategorized')
-            if selected_filter == "All" or selected_filter == category:
-                with st.expander(f"Document {i+1}: {doc['text'][:50]}..." + (f" ({category})" if category else "")):
-                    st.write(f"**Text**: {doc['text']}")
-                    st.write("**Metadata**:")
-                    st.json(doc['metadata'])
-                    
-                    col1, col2 = st.columns([4, 1])
-                    with col2:
-                        if st.button(f"Remove", key=f"remove_{i}"):
-                            st.session_state.documents.pop(i)
-                            st.rerun()
+        # Paginated table of documents
+        render_document_table()
     
     # Index documents button and options
     st.subheader("Index Documents")
     
+    if split_mode and st.session_state.documents:
+        # Preview of what will be submitted
+        split_lengths = []
+        for _ in iter_split_documents(st.session_state.documents, *splitting, lengths=split_lengths):
+            pass
+        render_split_summary(split_lengths, len(st.session_state.documents))
+    
     if st.button("Index Documents", type="primary"):
         if not collection_name:
             st.warning("Please enter a collection name")
@@ -269,79 +422,249 @@ def render_index_tab():
         else:
             with st.spinner(f"Indexing {len(st.session_state.documents)} documents to collection '{collection_name}'..."):
                 try:
-                    # Build the URL with parameters
-                    url = INDEX_API.format(collection_name=collection_name)
-                    params = {}
-                    
-                    if m_param > 0:
-                        # Validate M parameter range as per API
-                        if 8 <= m_param <= 64:
-                            params["m"] = m_param
-                        else:
-                            st.warning("M parameter must be between 8 and 64. Using auto-optimization instead.")
-                    
-                    if ef_construction > 0:
-                        params["ef_construction"] = ef_construction
-                    
-                    # Prepare the payload
-                    payload = {
-                        "documents": st.session_state.documents,
-                        "tune_parameters": tune_parameters
-                    }
+                    url, params, payload, tuning_payload = build_index_request(
+                        collection_name, m_param, ef_construction, tuning_options
+                    )
                     
-                    # Add tuning parameters if enabled
-                    if tune_parameters:
-                        payload["tune_vector_space"] = tune_vector_space
-                        payload["tune_sample_size"] = tune_sample_size
-                        payload["apply_best_params"] = apply_best_params
-                        payload["store_tuning_results"] = store_tuning_results
-                        
-                        # Add a minimal param grid for tuning (can be expanded)
-                        payload["tune_param_grid"] = [{
-                            "name": tune_vector_space,
-                            "parameters": {}  # Let the API use defaults
-                        }]
+                    # Split long documents, then collapse duplicates so each part is sent only once
+                    duplicate_counts = {}
+                    documents = list(iter_unique_documents(
+                        iter_split_documents(st.session_state.documents, *splitting),
+                        skip_duplicate_texts, skip_duplicate_ids, duplicate_counts
+                    ))
+                    if duplicate_counts["duplicate_text"] or duplicate_counts["duplicate_id"]:
+                        st.info(f"Skipped {duplicate_counts['duplicate_text']} duplicate texts and "
+                                f"{duplicate_counts['duplicate_id']} duplicate IDs")
                     
-                    # Make the API request
-                    response = requests.post(url, params=params, json=payload)
+                    # Send only the delta since the last run
+                    if skip_unchanged:
+                        delta_counts = {}
+                        documents = list(iter_changed_documents(
+                            manifest, collection_name, documents, delta_counts,
+                            on_unchanged=keyword_backfill(collection_name, keyword_index if update_keyword_index else None)
+                        ))
+                        if delta_counts["unchanged"]:
+                            st.info(f"Skipped {delta_counts['unchanged']} documents unchanged since they were last indexed")
+                    on_chunk_indexed = chunk_recorder(
+                        collection_name, manifest if skip_unchanged else None, keyword_index if update_keyword_index else None
+                    )
                     
-                    if response.status_code == 200:
-                        result = response.json()
-                        
-                        # Display success message with details
-                        st.success(f"Successfully indexed documents in collection '{collection_name}'!")
-                        
-                        # Create detailed result display
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            st.metric("Documents Indexed", result.get("indexed_count", 0))
-                            st.write(f"**Message**: {result.get('message', 'Indexing completed')}")
-                        
-                        with col2:
-                            # Display any tuning results if available
-                            if "tuning_results" in result:
-                                st.write("**Tuning Results**:")
-                                st.json(result["tuning_results"])
-                            
-                            if "parameter_note" in result:
-                                st.info(result["parameter_note"])
-                            
-                            if "tuning_file" in result:
-                                st.write(f"**Tuning File**: {result['tuning_file']}")
-                        
-                        # Option to clear documents after successful indexing
-                        if st.button("Clear Indexed Documents"):
-                            st.session_state.documents = []
-                            st.rerun()
+                    if not documents:
+                        st.success(f"Collection '{collection_name}' is already up to date; nothing to send.")
                     else:
-                        error_message = "Unknown error"
-                        try:
-                            error_detail = response.json().get("detail", response.text)
-                            error_message = error_detail
-                        except:
-                            error_message = response.text
-                        
-                        st.error(f"Error: {response.status_code} - {error_message}")
+                        job_id = job_fingerprint(collection_name, sorted(params.items()), tuning_payload, chunk_size,
+                                                 documents_fingerprint(documents))
+                        chunks = iter_chunks(documents, chunk_size)
+                        total_chunks = (len(documents) + chunk_size - 1) // chunk_size
+                        checkpoint = run_index_job(job_id, url, params, chunks, total_chunks, payload, tuning_payload,
+                                                   max_in_flight, on_chunk_indexed=on_chunk_indexed)
+                        render_index_results(collection_name, checkpoint)
                 except Exception as e:
-                    st.error(f"An error occurred: {str(e)}")
\ No newline at end of file
+                    st.error(f"An error occurred: {str(e)}")
+
+def build_index_request(collection_name, m_param, ef_construction, tuning_options):
+    """Build the index URL, query parameters, per-chunk payload and first-chunk tuning payload"""
+    # Build the URL with parameters
+    url = INDEX_API.format(collection_name=collection_name)
+    params = {}
+    
+    if m_param > 0:
+        # Validate M parameter range as per API
+        if 8 <= m_param <= 64:
+            params["m"] = m_param
+        else:
+            st.warning("M parameter must be between 8 and 64. Using auto-optimization instead.")
+    
+    if ef_construction > 0:
+        params["ef_construction"] = ef_construction
+    
+    # Prepare the payload shared by every chunk
+    payload = {
+        "tune_parameters": False
+    }
+    
+    # Tuning runs once, on the first chunk
+    tuning_payload = None
+    if tuning_options:
+        tuning_payload = {
+            "tune_parameters": True,
+            **tuning_options,
+            # Add a minimal param grid for tuning (can be expanded)
+            "tune_param_grid": [{
+                "name": tuning_options["tune_vector_space"],
+                "parameters": {}  # Let the API use defaults
+            }]
+        }
+    
+    return url, params, payload, tuning_payload
+
+def index_record_stream(collection_name, records, counts, source_key, progress_fraction, request, chunk_size, max_in_flight,
+                        skip_duplicate_texts, skip_duplicate_ids, splitting=(None, 0, 0), manifest=None, keyword_index=None):
+    """Validate and index a stream of uploaded records chunk by chunk
+    
+    Records are validated, split and de-duplicated lazily and piped straight into
+    chunked index requests, so the corpus is never held in memory or session state.
+    source_key identifies the upload (file name, size, column mapping) for resuming.
+    With a manifest, only new or changed documents are sent and each indexed chunk
+    is recorded in it; with a keyword index, indexed chunks are also added there.
+    """
+    url, params, payload, tuning_payload = request
+    split_lengths = [] if splitting[0] else None
+    documents = iter_unique_documents(
+        iter_split_documents(iter_valid_documents(records, counts), *splitting, lengths=split_lengths),
+        skip_duplicate_texts, skip_duplicate_ids, counts
+    )
+    on_chunk_indexed = chunk_recorder(collection_name, manifest, keyword_index)
+    manifest_state = None
+    if manifest is not None:
+        documents = iter_changed_documents(
+            manifest, collection_name, documents, counts, on_unchanged=keyword_backfill(collection_name, keyword_index)
+        )
+        # Chunk boundaries shift as the manifest fills, so a changed manifest starts a new job
+        manifest_state = manifest.count(collection_name)
+    job_id = job_fingerprint(collection_name, sorted(params.items()), tuning_payload, chunk_size,
+                             source_key, skip_duplicate_texts, skip_duplicate_ids, splitting, manifest_state)
+    checkpoint = run_index_job(
+        job_id, url, params, iter_chunks(documents, chunk_size), None, payload, tuning_payload, max_in_flight,
+        progress_fraction=progress_fraction, on_chunk_indexed=on_chunk_indexed
+    )
+    
+    if counts.get("unchanged"):
+        st.info(f"Skipped {counts['unchanged']} documents unchanged since they were last indexed")
+    
+    skipped = counts.get("invalid", 0) + counts.get("duplicate_text", 0) + counts.get("duplicate_id", 0)
+    if skipped:
+        st.info(f"Skipped {counts.get('invalid', 0)} invalid records, {counts.get('duplicate_text', 0)} duplicate texts "
+                f"and {counts.get('duplicate_id', 0)} duplicate IDs")
+    if split_lengths:
+        render_split_summary(split_lengths)
+    render_index_results(collection_name, checkpoint)
+
+def render_split_summary(lengths, source_count=None):
+    """Show the number of parts produced by splitting and their length distribution"""
+    summary = split_summary(lengths)
+    if not summary["count"]:
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Parts", summary["count"], f"from {source_count} documents" if source_count else None, delta_color="off")
+    col2.metric("Median Length", summary["p50"])
+    col3.metric("p95 Length", summary["p95"])
+    col4.metric("Max Length", summary["max"])
+    
+    # Length histogram
+    counts, edges = np.histogram(lengths, bins=min(20, len(set(lengths))))
+    st.bar_chart(pd.DataFrame({"parts": counts}, index=pd.Index(np.round(edges[:-1], 1), name="length")))
+
+def chunk_recorder(collection_name, manifest=None, keyword_index=None):
+    """Callback recording each chunk the API accepted in the manifest and keyword index, if given"""
+    if manifest is None and keyword_index is None:
+        return None
+    
+    def record(chunk):
+        if manifest is not None:
+            manifest.record(collection_name, chunk)
+        if keyword_index is not None:
+            keyword_index.add(collection_name, chunk)
+    return record
+
+def keyword_backfill(collection_name, keyword_index=None):
+    """Callback adding unchanged documents the keyword index is missing, e.g. ones indexed before it existed"""
+    if keyword_index is None:
+        return None
+    return lambda documents: keyword_index.add_missing(collection_name, documents)
+
+def run_index_job(job_id, url, params, chunks, total_chunks, payload, tuning_payload, max_in_flight,
+                  progress_fraction=None, on_chunk_indexed=None):
+    """Send chunks to the index API concurrently, checkpointing completed chunks
+    
+    The checkpoint in session state records which chunks succeeded. Running the
+    same job again (same collection, parameters, chunking and documents) skips
+    those chunks, so only failed or never-sent chunks are resent. total_chunks may
+    be None when the number of chunks is not known up front, in which case
+    progress_fraction() supplies the progress instead. on_chunk_indexed(documents)
+    is called for every chunk the API accepted.
+    """
+    checkpoint = st.session_state.get("index_checkpoint")
+    if not checkpoint or checkpoint["job_id"] != job_id:
+        checkpoint = {"job_id": job_id, "done": set(), "indexed_count": 0, "first_result": None, "last_result": None}
+        st.session_state.index_checkpoint = checkpoint
+    elif checkpoint["done"]:
+        st.info(f"Resuming: {len(checkpoint['done'])} chunks indexed earlier are not resent")
+    
+    done = checkpoint["done"]
+    pending_chunks = ((chunk_index, chunk) for chunk_index, chunk in enumerate(chunks) if chunk_index not in done)
+    first_chunk_payload = tuning_payload if 0 not in done else None
+    checkpoint["failed"] = []
+    
+    progress_bar = st.progress(0)
+    status_area = st.empty()
+    chunk_status = []
+    
+    for chunk_index, chunk, result, error in index_chunks(url, params, pending_chunks, payload, max_in_flight, first_chunk_payload):
+        if error is not None:
+            checkpoint["failed"].append(chunk_index)
+            chunk_status.append({"chunk": chunk_index + 1, "documents": len(chunk), "status": "failed", "error": str(error)})
+        else:
+            done.add(chunk_index)
+            if on_chunk_indexed:
+                on_chunk_indexed(chunk)
+            checkpoint["indexed_count"] += result.get("indexed_count", 0)
+            checkpoint["last_result"] = result
+            if chunk_index == 0:
+                checkpoint["first_result"] = result
+            chunk_status.append({"chunk": chunk_index + 1, "documents": len(chunk), "status": "indexed", "error": ""})
+        
+        # Progress advances per completed chunk
+        finished = len(done) + len(checkpoint["failed"])
+        progress_text = f"Chunk {finished}/{total_chunks}" if total_chunks else f"Chunk {finished}"
+        progress_bar.progress(
+            min(progress_fraction() if progress_fraction else finished / total_chunks, 1.0),
+            text=f"{progress_text} ({checkpoint['indexed_count']} documents indexed)"
+        )
+        with status_area.container():
+            st.dataframe(pd.DataFrame(chunk_status[-10:]), use_container_width=True, hide_index=True)
+    
+    progress_bar.progress(1.0)
+    return checkpoint
+
+def render_index_results(collection_name, checkpoint):
+    """Show the outcome of a chunked indexing job"""
+    first_result = checkpoint["first_result"] or {}
+    last_result = checkpoint["last_result"] or {}
+    
+    # Cached search responses for this collection are now stale
+    if checkpoint["done"]:
+        get_search_cache().invalidate(collection_name)
+    
+    if checkpoint["failed"]:
+        st.warning(f"{len(checkpoint['failed'])} chunk(s) failed after retries. Press Index Documents again to resume; "
+                   f"the {len(checkpoint['done'])} chunks already indexed will not be resent.")
+    else:
+        # The job finished: the next run starts from scratch
+        del st.session_state.index_checkpoint
+        st.success(f"Successfully indexed documents in collection '{collection_name}'!")
+    
+    # Create detailed result display
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.metric("Documents Indexed", checkpoint["indexed_count"])
+        st.write(f"**Message**: {last_result.get('message', 'Indexing completed')}")
+    
+    with col2:
+        # Display any tuning results if available
+        if "tuning_results" in first_result:
+            st.write("**Tuning Results**:")
+            st.json(first_result["tuning_results"])
+        
+        if "parameter_note" in first_result:
+            st.info(first_result["parameter_note"])
+        
+        if "tuning_file" in first_result:
+            st.write(f"**Tuning File**: {first_result['tuning_file']}")
+    
+    # Option to clear documents after successful indexing
+    if not checkpoint["failed"] and st.button("Clear Indexed Documents"):
+        clear_documents()
+        st.rerun()
@@ -0,0 +1,200 @@
+import io
+import json
+import re
+import pandas as pd
+
+# Text read from an uploaded file per parser refill
+READ_SIZE = 1 << 16
+
+# Rows read per CSV chunk or Parquet batch
+TABLE_READ_ROWS = 10000
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+def is_valid_document(doc):
+    """Whether a record has the document shape the index API expects"""
+    return (
+        isinstance(doc, dict)
+        and isinstance(doc.get("text"), str)
+        and bool(doc["text"].strip())
+        and isinstance(doc.get("metadata", {}), dict)
+    )
+
+def iter_valid_documents(records, counts=None):
+    """Lazily yield the valid documents of a record stream, counting the rest in counts["invalid"]"""
+    if counts is not None:
+        counts.setdefault("invalid", 0)
+    for record in records:
+        if is_valid_document(record):
+            yield record
+        elif counts is not None:
+            counts["invalid"] += 1
+
+def iter_jsonl(binary_file, counts=None):
+    """Yield one record per non-blank line of a JSON Lines file
+    
+    Lines that are not valid JSON are counted in counts["invalid"] and skipped.
+    """
+    reader = io.TextIOWrapper(binary_file, encoding="utf-8", errors="replace")
+    try:
+        for line in reader:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                if counts is not None:
+                    counts["invalid"] = counts.get("invalid", 0) + 1
+    finally:
+        # Detach so closing the wrapper does not close the uploaded file
+        reader.detach()
+
+def iter_json_array(binary_file, read_size=READ_SIZE):
+    """Yield the elements of a top-level JSON array without loading the whole file
+    
+    Text is read in blocks and each element is decoded in place with
+    JSONDecoder.raw_decode. Only the unparsed tail of the current block is kept.
+    Raises ValueError if the file is not a single JSON array.
+    """
+    decoder = json.JSONDecoder()
+    reader = io.TextIOWrapper(binary_file, encoding="utf-8", errors="replace")
+    # expect is "[" before the array, "first" after it opens, "," after an element and "value" after a comma
+    buffer, position, eof, expect = "", 0, False, "["
+    try:
+        while True:
+            position = WHITESPACE.match(buffer, position).end()
+            if position >= len(buffer):
+                if eof:
+                    raise ValueError("Unexpected end of file inside the JSON array")
+                buffer, position, eof = _refill(reader, buffer, position, read_size)
+                continue
+            
+            char = buffer[position]
+            if expect == "[":
+                if char != "[":
+                    raise ValueError("The uploaded file does not contain a list of documents")
+                expect = "first"
+                position += 1
+                continue
+            if char == "]" and expect != "value":
+                _check_trailing(reader, buffer, position + 1, eof, read_size)
+                return
+            if char == "," and expect == ",":
+                expect = "value"
+                position += 1
+                continue
+            if expect == "," or char in ",]":
+                raise ValueError(f"Invalid JSON array: unexpected {char!r} between elements")
+            
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # The element continues past the end of the buffer
+                buffer, position, eof = _refill(reader, buffer, position, read_size)
+                continue
+            if end == len(buffer) and not eof:
+                # A scalar ending exactly at the buffer edge may be truncated
+                buffer, position, eof = _refill(reader, buffer, position, read_size)
+                continue
+            yield element
+            position, expect = end, ","
+    finally:
+        reader.detach()
+
+def _check_trailing(reader, buffer, position, eof, read_size):
+    """Raise ValueError unless only whitespace follows the closing bracket of the array"""
+    while True:
+        position = WHITESPACE.match(buffer, position).end()
+        if position < len(buffer):
+            raise ValueError("Invalid JSON array: unexpected content after the closing ']'")
+        if eof:
+            return
+        buffer, position, eof = _refill(reader, buffer, position, read_size)
+
+def _refill(reader, buffer, position, read_size):
+    """Drop the consumed part of the buffer and append the next block of text"""
+    block = reader.read(read_size)
+    return buffer[position:] + block, 0, not block
+
+def iter_upload_records(uploaded_file, counts=None):
+    """Stream the records of an uploaded JSON array or JSON Lines file, chosen by extension"""
+    uploaded_file.seek(0)
+    if uploaded_file.name.lower().endswith(".jsonl"):
+        return iter_jsonl(uploaded_file, counts)
+    return iter_json_array(uploaded_file)
+
+def _parquet_file(uploaded_file):
+    """Open an uploaded Parquet file, importing pyarrow only when it is needed"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading Parquet files requires pyarrow. Install it with: pip install pyarrow")
+    uploaded_file.seek(0)
+    return pq.ParquetFile(uploaded_file)
+
+def table_columns(uploaded_file, file_type):
+    """Return the column names of an uploaded CSV or Parquet file without reading its rows"""
+    if file_type == "parquet":
+        return list(_parquet_file(uploaded_file).schema_arrow.names)
+    uploaded_file.seek(0)
+    columns = list(pd.read_csv(uploaded_file, nrows=0, dtype=str, keep_default_na=False).columns)
+    uploaded_file.seek(0)
+    return columns
+
+def table_row_count(uploaded_file, file_type):
+    """Row count from the Parquet footer, or None for CSV where it is unknown until read"""
+    if file_type == "parquet":
+        return _parquet_file(uploaded_file).metadata.num_rows
+    return None
+
+def iter_table_frames(uploaded_file, file_type, columns, read_rows=TABLE_READ_ROWS):
+    """Yield DataFrames of at most read_rows rows holding only the requested columns"""
+    if file_type == "parquet":
+        for batch in _parquet_file(uploaded_file).iter_batches(batch_size=read_rows, columns=columns):
+            yield batch.to_pandas()
+        return
+    # Read values as text, like JSON uploads, so IDs such as 00123 keep their zeros
+    # and integer columns with blanks do not turn into floats; only blanks become null
+    uploaded_file.seek(0)
+    yield from pd.read_csv(uploaded_file, usecols=columns, chunksize=read_rows, dtype=str,
+                           keep_default_na=False, na_values=[""])
+
+def frame_documents(frame, text_column, metadata_columns, counts=None):
+    """Yield documents for the rows of a DataFrame, counting rows without text in counts["invalid"]"""
+    texts = frame[text_column].astype("string").str.strip()
+    has_text = texts.notna() & (texts != "")
+    if counts is not None:
+        counts["invalid"] = counts.get("invalid", 0) + int((~has_text).sum())
+    
+    texts = texts[has_text].tolist()
+    if not metadata_columns:
+        for text in texts:
+            yield {"text": text, "metadata": {}}
+        return
+    
+    # Missing values become null rather than NaN, which is not valid JSON
+    metadata = frame.loc[has_text, metadata_columns]
+    for column in metadata.select_dtypes(include=["datetime", "datetimetz"]).columns:
+        metadata[column] = metadata[column].map(lambda value: value.isoformat() if pd.notna(value) else None)
+    metadata = metadata.astype(object)
+    metadata = metadata.where(metadata.notna(), None).to_dict("records")
+    for text, meta in zip(texts, metadata):
+        yield {"text": text, "metadata": meta}
+
+def iter_table_documents(uploaded_file, file_type, text_column, metadata_columns, counts=None, read_rows=TABLE_READ_ROWS):
+    """Stream documents from an uploaded CSV or Parquet file one chunk of rows at a time
+    
+    Only the mapped columns are read, and dicts are built per chunk rather than
+    for the whole table. Rows read so far are tracked in counts["rows"].
+    """
+    columns = [text_column] + [column for column in metadata_columns if column != text_column]
+    metadata_columns = columns[1:]
+    if counts is not None:
+        counts.setdefault("invalid", 0)
+        counts.setdefault("rows", 0)
+    for frame in iter_table_frames(uploaded_file, file_type, columns, read_rows):
+        if counts is not None:
+            counts["rows"] += len(frame)
+        yield from frame_documents(frame, text_column, metadata_columns, counts)
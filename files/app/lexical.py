@@ -0,0 +1,198 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+import pandas as pd
+import streamlit as st
+from embed_cache import normalize_text
+from filters import filter_mask
+from manifest import DATA_DIR, content_hash, manifest_key
+
+# BM25 term-frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Reciprocal-rank fusion constant; larger values flatten the rank weighting
+RRF_K = 60
+
+# Ranked keyword hits whose payloads are loaded per query when filtering
+PAYLOAD_BATCH_SIZE = 500
+
+# Words, plus compound terms such as error codes, versions and IDs (ERR-404, v1.2.3)
+TOKEN_PATTERN = re.compile(r"\w+(?:[-_.:/]\w+)*")
+
+def tokenize(text):
+    """Lowercased terms of a text; compound terms are kept whole and also split into their parts"""
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        terms.append(token)
+        parts = re.findall(r"[^\W_]+", token)
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+class KeywordIndex:
+    """SQLite-backed BM25 inverted index per collection, updated incrementally as documents are indexed
+    
+    Documents are keyed like the index manifest (metadata.id, else content), so
+    re-indexing a document replaces its postings.
+    """
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "collection TEXT NOT NULL, key TEXT NOT NULL, length INTEGER NOT NULL, payload TEXT NOT NULL, "
+            "PRIMARY KEY (collection, key))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "collection TEXT NOT NULL, term TEXT NOT NULL, key TEXT NOT NULL, tf INTEGER NOT NULL, "
+            "PRIMARY KEY (collection, term, key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS postings_by_key ON postings (collection, key)")
+        self._db.commit()
+    
+    def add(self, collection, documents):
+        """Add or replace documents in collection's inverted index"""
+        document_rows, posting_rows = [], []
+        for document in documents:
+            key = manifest_key(document, content_hash(document))
+            terms = Counter(tokenize(document["text"]))
+            payload = {**document.get("metadata", {}), "text": document["text"]}
+            document_rows.append((collection, key, sum(terms.values()), json.dumps(payload, default=str)))
+            posting_rows.extend((collection, term, key, tf) for term, tf in terms.items())
+        with self._lock:
+            self._db.executemany("DELETE FROM postings WHERE collection = ? AND key = ?",
+                                 [(collection, key) for _, key, _, _ in document_rows])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO documents (collection, key, length, payload) VALUES (?, ?, ?, ?)", document_rows
+            )
+            self._db.executemany("INSERT INTO postings (collection, term, key, tf) VALUES (?, ?, ?, ?)", posting_rows)
+            self._db.commit()
+    
+    def add_missing(self, collection, documents):
+        """Add only the documents collection's index does not hold yet, e.g. ones indexed before it existed"""
+        documents = list(documents)
+        keys = [manifest_key(document, content_hash(document)) for document in documents]
+        with self._lock:
+            present = {row[0] for row in self._db.execute(
+                f"SELECT key FROM documents WHERE collection = ? AND key IN ({','.join('?' * len(keys))})",
+                [collection, *keys]
+            ).fetchall()} if keys else set()
+        missing = [document for key, document in zip(keys, documents) if key not in present]
+        if missing:
+            self.add(collection, missing)
+    
+    def count(self, collection):
+        """Number of documents in collection's keyword index"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM documents WHERE collection = ?", (collection,)).fetchone()[0]
+    
+    def forget(self, collection):
+        """Drop collection's keyword index"""
+        with self._lock:
+            self._db.execute("DELETE FROM postings WHERE collection = ?", (collection,))
+            self._db.execute("DELETE FROM documents WHERE collection = ?", (collection,))
+            self._db.commit()
+    
+    def search(self, collection, query, k, conditions=None):
+        """Return the k best BM25 matches for query as search API-style results
+        
+        With filter conditions, ranked hits are checked in batches until k match,
+        so filtering does not shrink the result list.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            total, average_length = self._db.execute(
+                "SELECT COUNT(*), AVG(length) FROM documents WHERE collection = ?", (collection,)
+            ).fetchone()
+            postings = pd.DataFrame(self._db.execute(
+                "SELECT p.term, p.key, p.tf, d.length FROM postings p "
+                "JOIN documents d ON d.collection = p.collection AND d.key = p.key "
+                f"WHERE p.collection = ? AND p.term IN ({','.join('?' * len(terms))})",
+                [collection, *terms]
+            ).fetchall(), columns=["term", "key", "tf", "length"])
+        if postings.empty:
+            return []
+        
+        # BM25 over every posting at once, summed per document
+        document_frequency = postings.groupby("term")["key"].transform("count")
+        idf = (1 + (total - document_frequency + 0.5) / (document_frequency + 0.5)).map(math.log)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * postings["length"] / max(average_length, 1e-9))
+        postings["score"] = idf * postings["tf"] * (BM25_K1 + 1) / (postings["tf"] + norm)
+        ranked = postings.groupby("key")["score"].sum().sort_values(ascending=False, kind="stable")
+        
+        results = []
+        step = PAYLOAD_BATCH_SIZE if conditions else k
+        for start in range(0, len(ranked), step):
+            batch = ranked.iloc[start:start + step]
+            payloads = self._payloads(collection, batch.index.tolist())
+            if conditions:
+                keep = filter_mask(pd.DataFrame(payloads), conditions)
+                batch, payloads = batch[keep], [payload for payload, kept in zip(payloads, keep) if kept]
+            for (key, score), payload in zip(batch.items(), payloads):
+                results.append({"id": payload.get("id", key), "score": float(score), "payload": payload})
+            if len(results) >= k:
+                break
+        return results[:k]
+    
+    def _payloads(self, collection, keys):
+        """Stored payloads of keys, in the same order"""
+        with self._lock:
+            rows = dict(self._db.execute(
+                f"SELECT key, payload FROM documents WHERE collection = ? AND key IN ({','.join('?' * len(keys))})",
+                [collection, *keys]
+            ).fetchall())
+        return [json.loads(rows[key]) for key in keys]
+
+def fusion_key(item, ids_by_text=None):
+    """Identity of a result across search legs
+    
+    The payload's metadata id when it has one. Otherwise the id of the one
+    identified result sharing its normalized text, if any, else that text, since
+    result ids differ between legs.
+    """
+    payload = item.get("payload", {})
+    if payload.get("id") is not None:
+        return ("id", str(payload["id"]))
+    text = normalize_text(payload.get("text", ""))
+    ids = (ids_by_text or {}).get(text, set())
+    if len(ids) == 1:
+        return ("id", next(iter(ids)))
+    return ("text", text or str(item.get("id")))
+
+def reciprocal_rank_fusion(legs, k, rrf_k=RRF_K):
+    """Fuse ranked result lists by summing 1 / (rrf_k + rank) across legs
+    
+    legs maps a leg name to its results. Each fused result keeps the first leg's
+    copy and records its rank in every leg under "ranks".
+    """
+    ids_by_text = {}
+    for results in legs.values():
+        for item in results:
+            payload = item.get("payload", {})
+            if payload.get("id") is not None:
+                ids_by_text.setdefault(normalize_text(payload.get("text", "")), set()).add(str(payload["id"]))
+    
+    fused = {}
+    for leg, results in legs.items():
+        for rank, item in enumerate(results, start=1):
+            key = fusion_key(item, ids_by_text)
+            if key not in fused:
+                fused[key] = {**item, "score": 0.0, "ranks": {}}
+            fused[key]["score"] += 1 / (rrf_k + rank)
+            fused[key]["ranks"][leg] = rank
+    return sorted(fused.values(), key=lambda item: item["score"], reverse=True)[:k]
+
+@st.cache_resource
+def get_keyword_index():
+    """Return the process-wide keyword index"""
+    return KeywordIndex(os.path.join(DATA_DIR, "keyword_index.sqlite3"))
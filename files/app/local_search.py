@@ -0,0 +1,176 @@
+import json
+import time
+import numpy as np
+import pandas as pd
+from embed import npz_texts
+from filters import filter_mask, missing_fields
+
+# Vector spaces the local engine supports, matching the search tab options
+LOCAL_METRICS = ["cosine", "dot_product", "euclidean", "manhattan"]
+
+# Working memory allowed for one block of scores
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+def load_vectors(uploaded_file):
+    """Load an embedding matrix with optional texts and metadata from an .npz (Embed tab export) or .npy file
+    
+    An .npz may carry a "metadata" array of JSON objects, one per row, which
+    local filtered searches evaluate.
+    """
+    uploaded_file.seek(0)
+    metadata = None
+    if uploaded_file.name.lower().endswith(".npz"):
+        with np.load(uploaded_file, allow_pickle=False) as archive:
+            matrix = archive["embeddings"]
+            texts = npz_texts(archive)
+            if "metadata" in archive.files:
+                metadata = pd.DataFrame([json.loads(record) for record in archive["metadata"].tolist()])
+    else:
+        matrix, texts = np.load(uploaded_file, allow_pickle=False), None
+    matrix = np.atleast_2d(matrix)
+    if matrix.ndim != 2:
+        raise ValueError(f"Expected a 2-D embedding matrix, got shape {matrix.shape}")
+    return matrix, texts, metadata
+
+class LocalIndex:
+    """Exact k-nearest-neighbour search over an in-memory float32 matrix
+    
+    The matrix is scanned in row blocks sized to a memory budget. Each block keeps
+    only its top-k candidates (argpartition), which are merged into a running
+    top-k, so memory stays bounded however many rows there are.
+    """
+    def __init__(self, matrix, texts=None, metadata=None):
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.texts = texts
+        self.metadata = metadata
+        self._sq_norms = None
+        self._payloads = None
+    
+    def __len__(self):
+        return self.matrix.shape[0]
+    
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+    
+    def sq_norms(self):
+        """Squared row norms, computed once and reused by cosine and euclidean searches"""
+        if self._sq_norms is None:
+            self._sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        return self._sq_norms
+    
+    def payload_frame(self):
+        """Row payload fields (metadata plus text) as a DataFrame for filter masks"""
+        if self._payloads is None:
+            frame = self.metadata.copy() if self.metadata is not None else pd.DataFrame(index=range(len(self)))
+            if self.texts is not None:
+                frame["text"] = self.texts
+            self._payloads = frame
+        return self._payloads
+    
+    def payload(self, row):
+        """Search-result payload of one row"""
+        payload = {}
+        if self.metadata is not None:
+            payload.update({k: v.item() if isinstance(v, np.generic) else v
+                            for k, v in self.metadata.iloc[row].items() if pd.notna(v)})
+        if self.texts is not None:
+            payload["text"] = self.texts[row]
+        return payload
+    
+    def block_rows(self, n_queries, metric, memory_budget):
+        """Rows per block so that one block's working arrays fit in memory_budget bytes"""
+        # float32 scores plus int64 argpartition output per (query, row)
+        per_row = n_queries * 12
+        if metric == "manhattan":
+            per_row += n_queries * self.dim * 4
+        return max(1, memory_budget // per_row)
+    
+    def search(self, queries, k, metric="cosine", memory_budget=DEFAULT_MEMORY_BUDGET, mask=None):
+        """Return (indices, scores) of the k best rows for each query, best first
+        
+        queries may be one vector or a matrix of them. Scores are similarities for
+        cosine/dot_product and distances for euclidean/manhattan. A boolean row
+        mask restricts the search to matching rows before ranking (pre-filtering).
+        """
+        if metric not in LOCAL_METRICS:
+            raise ValueError(f"Unsupported vector space for local search: {metric}")
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match index dimension {self.dim}")
+        k = min(k, len(self) if mask is None else int(mask.sum()))
+        if k == 0:
+            return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+        
+        query_sq_norms = np.einsum("ij,ij->i", queries, queries)
+        if metric == "cosine":
+            queries = queries / np.maximum(np.sqrt(query_sq_norms), 1e-12)[:, None]
+        
+        # Internally higher is better; distances are negated until the end
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_indices = np.empty((len(queries), 0), dtype=np.int64)
+        step = self.block_rows(len(queries), metric, memory_budget)
+        for start in range(0, len(self), step):
+            block = self.matrix[start:start + step]
+            scores = self._block_scores(queries, query_sq_norms, block, start, metric)
+            if mask is not None:
+                block_mask = mask[start:start + block.shape[0]]
+                if not block_mask.any():
+                    continue
+                scores[:, ~block_mask] = -np.inf
+            block_k = min(k, block.shape[0])
+            top = np.argpartition(-scores, block_k - 1, axis=1)[:, :block_k]
+            
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            best_indices = np.concatenate([best_indices, top + start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_indices = np.take_along_axis(best_indices, keep, axis=1)
+        
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_indices = np.take_along_axis(best_indices, order, axis=1)
+        if metric == "euclidean":
+            best_scores = np.sqrt(np.maximum(-best_scores, 0))
+        elif metric == "manhattan":
+            best_scores = -best_scores
+        return best_indices, best_scores
+    
+    def _block_scores(self, queries, query_sq_norms, block, start, metric):
+        """Scores of every query against one block of rows, higher is better"""
+        if metric == "manhattan":
+            return -np.abs(queries[:, None, :] - block[None, :, :]).sum(axis=2)
+        
+        products = queries @ block.T
+        if metric == "dot_product":
+            return products
+        
+        block_sq_norms = self.sq_norms()[start:start + block.shape[0]]
+        if metric == "cosine":
+            return products / np.maximum(np.sqrt(block_sq_norms), 1e-12)[None, :]
+        # euclidean: -(|q|^2 - 2 q.x + |x|^2)
+        return 2 * products - query_sq_norms[:, None] - block_sq_norms[None, :]
+
+def search_response(index, query, k, metric, conditions=None):
+    """Run one local search, pre-filtered by any filter conditions, shaped like a search API response"""
+    start_time = time.time()
+    mask = None
+    if conditions:
+        # A field the index lacks would silently match nothing
+        missing = missing_fields(index.payload_frame(), conditions)
+        if missing:
+            raise ValueError(f"The local index has no {', '.join(missing)} field to filter on. Load an .npz with a "
+                             "\"metadata\" array carrying it, or clear the metadata filter.")
+        mask = filter_mask(index.payload_frame(), conditions)
+    indices, scores = index.search(query, k, metric, mask=mask)
+    search_time = time.time() - start_time
+    results = []
+    for row, score in zip(indices[0].tolist(), scores[0].tolist()):
+        results.append({"id": row, "score": score, "payload": index.payload(row)})
+    return {
+        "results": results,
+        "total_found": len(results),
+        "metric_used": f"{metric} (local exact)",
+        "search_time_ms": round(search_time * 1000, 2),
+    }
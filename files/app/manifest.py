@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import streamlit as st
+from app_config import APP_CONFIG
+
+DATA_DIR = APP_CONFIG.get("storage", {}).get("data_dir", "data")
+
+# Documents looked up in the manifest per query
+LOOKUP_BATCH_SIZE = 500
+
+def content_hash(document):
+    """Digest of a document's text and metadata; any change to either marks it changed"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(document["text"].encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(json.dumps(document.get("metadata", {}), sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+def manifest_key(document, digest):
+    """Manifest key: metadata.id when present, otherwise the content itself"""
+    doc_id = document.get("metadata", {}).get("id")
+    return f"id:{doc_id}" if doc_id is not None else f"content:{digest}"
+
+class IndexManifest:
+    """SQLite record of what has been indexed into each collection, as key -> content hash"""
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "collection TEXT NOT NULL, key TEXT NOT NULL, content_hash TEXT NOT NULL, "
+            "PRIMARY KEY (collection, key))"
+        )
+        self._db.commit()
+    
+    def lookup(self, collection, keys):
+        """Return a dict of key -> content hash for the keys already indexed into collection"""
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT key, content_hash FROM documents WHERE collection = ? AND key IN ({','.join('?' * len(keys))})",
+                [collection, *keys]
+            ).fetchall() if keys else []
+        return dict(rows)
+    
+    def record(self, collection, documents):
+        """Mark documents as indexed into collection with their current content"""
+        rows = []
+        for document in documents:
+            digest = content_hash(document)
+            rows.append((collection, manifest_key(document, digest), digest))
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO documents (collection, key, content_hash) VALUES (?, ?, ?)", rows
+            )
+            self._db.commit()
+    
+    def count(self, collection):
+        """Number of documents recorded for collection"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM documents WHERE collection = ?", (collection,)).fetchone()[0]
+    
+    def forget(self, collection):
+        """Drop every record for collection so the next run sends all documents"""
+        with self._lock:
+            self._db.execute("DELETE FROM documents WHERE collection = ?", (collection,))
+            self._db.commit()
+
+def iter_changed_documents(manifest, collection, documents, counts=None, batch_size=LOOKUP_BATCH_SIZE, on_unchanged=None):
+    """Lazily yield only the documents that are new or changed since they were last indexed
+    
+    Documents are checked against the manifest in batches; unchanged ones are
+    counted in counts["unchanged"] and passed, a batch at a time, to on_unchanged.
+    """
+    if counts is not None:
+        counts.setdefault("unchanged", 0)
+    batch = []
+    for document in documents:
+        digest = content_hash(document)
+        batch.append((manifest_key(document, digest), digest, document))
+        if len(batch) >= batch_size:
+            yield from _changed(manifest, collection, batch, counts, on_unchanged)
+            batch = []
+    if batch:
+        yield from _changed(manifest, collection, batch, counts, on_unchanged)
+
+def _changed(manifest, collection, batch, counts, on_unchanged=None):
+    """Yield the documents of one batch whose recorded hash is missing or different"""
+    indexed = manifest.lookup(collection, [key for key, _, _ in batch])
+    unchanged = []
+    for key, digest, document in batch:
+        if indexed.get(key) == digest:
+            if counts is not None:
+                counts["unchanged"] += 1
+            unchanged.append(document)
+            continue
+        yield document
+    if unchanged and on_unchanged:
+        on_unchanged(unchanged)
+
+@st.cache_resource
+def get_index_manifest():
+    """Return the process-wide index manifest"""
+    return IndexManifest(os.path.join(DATA_DIR, "index_manifest.sqlite3"))
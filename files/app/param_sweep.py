@@ -0,0 +1,52 @@
+from embed import request_embeddings
+from embed_cache import cache_key, get_embedding_cache
+
+VECTOR_SPACES = ["cosine", "dot_product", "euclidean", "manhattan", "jaccard", "hamming", "text", "code"]
+
+def embed_query(text):
+    """Embed a query once, reusing the shared embedding cache
+    
+    Returns (vector as a list of floats, whether it came from the cache).
+    """
+    cache = get_embedding_cache()
+    key = cache_key(text)
+    vector = cache.get_many([key]).get(key)
+    if vector is not None:
+        return vector.tolist(), True
+    embeddings, _ = request_embeddings([text])
+    cache.put_many([(key, embeddings[0])])
+    return embeddings[0].tolist(), False
+
+def parse_ef_values(text):
+    """Parse a comma-separated list of positive EF values, ignoring anything else"""
+    values = []
+    for part in text.split(","):
+        part = part.strip()
+        if part.isdigit() and int(part) > 0 and int(part) not in values:
+            values.append(int(part))
+    return values
+
+def sweep_variants(base_payload, query_vector, ef_values, vector_spaces):
+    """Build one labelled search payload per parameter setting, all sharing the same query vector
+    
+    EF values are swept with native search and vector spaces with custom search;
+    the remaining options come from base_payload.
+    """
+    base = {key: value for key, value in base_payload.items() if key not in ("query_text", "query_vector")}
+    variants = []
+    for ef in ef_values:
+        payload = {key: value for key, value in base.items() if key in ("collection_name", "limit", "score_all_documents", "filter")}
+        payload.update({"use_native_search": True, "hnsw": {"ef_construction": ef}, "query_vector": query_vector})
+        variants.append((f"native ef={ef}", payload))
+    for vector_space in vector_spaces:
+        payload = {key: value for key, value in base.items() if key not in ("hnsw",)}
+        payload.update({"use_native_search": False, "vector_space": vector_space, "query_vector": query_vector})
+        payload.setdefault("preprocessing", {"normalize": True})
+        variants.append((f"custom {vector_space}", payload))
+    return variants
+
+def overlap_at_k(reference_ids, ids):
+    """Fraction of reference result ids that also appear in ids"""
+    if not reference_ids:
+        return None
+    return len(set(reference_ids) & set(ids)) / len(reference_ids)
@@ -0,0 +1,127 @@
+import numpy as np
+from embed import DEFAULT_MAX_IN_FLIGHT as EMBED_MAX_IN_FLIGHT, embed_texts
+
+# Candidates fetched per requested result when reranking locally
+DEFAULT_OVERFETCH = 4
+
+# Texts per embedding request when candidates come back without vectors
+EMBED_BATCH_SIZE = 32
+
+# Vector spaces the rerank scores natively; others are rescored with cosine
+RERANK_METRICS = ["cosine", "dot_product", "euclidean", "manhattan"]
+
+# Custom scoring options applied by the local rerank instead of the API
+LOCAL_OPTIONS = ("threshold", "dimension_weights")
+LOCAL_PREPROCESSING = ("magnitude_weighting", "scale_factor")
+
+def overfetch_payload(payload, factor):
+    """Search payload for limit x factor candidates with their vectors
+    
+    Scoring options the rerank applies itself are left out, so the API does not
+    prune candidates the local weights or threshold would keep.
+    """
+    candidate_payload = {key: value for key, value in payload.items() if key not in LOCAL_OPTIONS}
+    if "preprocessing" in candidate_payload:
+        candidate_payload["preprocessing"] = {
+            key: value for key, value in candidate_payload["preprocessing"].items() if key not in LOCAL_PREPROCESSING
+        }
+    candidate_payload.update({"limit": payload["limit"] * factor, "with_vectors": True})
+    return candidate_payload
+
+def candidate_vectors(results):
+    """Float32 matrix with one vector per candidate
+    
+    Vectors returned by the API are used as they are; candidates without one are
+    embedded from their text through the embedding cache.
+    """
+    vectors = [item.get("vector") for item in results]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        texts = [results[i].get("payload", {}).get("text", "") for i in missing]
+        embedded, stats = embed_texts(texts, EMBED_BATCH_SIZE, EMBED_MAX_IN_FLIGHT)
+        if stats["error"]:
+            raise RuntimeError(f"Could not embed the candidate texts: {stats['error']}")
+        for i, vector in zip(missing, embedded):
+            vectors[i] = vector
+    if not vectors:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.asarray(vectors, dtype=np.float32)
+
+def rerank_metric(vector_space):
+    """The metric the rerank scores with for a search's vector space (None for native search)"""
+    return vector_space if vector_space in RERANK_METRICS else "cosine"
+
+def rescore(query, vectors, weights=None, magnitude_scale=None, metric="cosine", normalize=False):
+    """Weighted similarity of every candidate to the query, higher is better
+    
+    weights scale each dimension (all ones by default). cosine and dot_product
+    return the weighted similarity; euclidean and manhattan return 1 / (1 +
+    weighted distance), so thresholds stay in [0, 1]. With normalize, vectors
+    are scaled to unit length first. With magnitude_scale, scores are multiplied
+    by (|x| / max |x|) ** magnitude_scale to favour candidates with larger vectors.
+    """
+    weights = np.ones(vectors.shape[1], dtype=np.float32) if weights is None else weights
+    magnitudes = np.linalg.norm(vectors, axis=1)
+    if normalize:
+        vectors = vectors / np.maximum(magnitudes, 1e-12)[:, None]
+        query = query / max(np.linalg.norm(query), 1e-12)
+    if metric == "dot_product":
+        scores = vectors @ (weights * query)
+    elif metric == "euclidean":
+        scores = 1 / (1 + np.sqrt(np.maximum(((vectors - query) ** 2) @ weights, 0)))
+    elif metric == "manhattan":
+        scores = 1 / (1 + np.abs(vectors - query) @ weights)
+    else:
+        query_norm = np.sqrt((query * query) @ weights)
+        candidate_norms = np.sqrt((vectors * vectors) @ weights)
+        scores = (vectors @ (weights * query)) / np.maximum(candidate_norms * query_norm, 1e-12)
+    if magnitude_scale:
+        scores = scores * (magnitudes / max(magnitudes.max(), 1e-12)) ** magnitude_scale
+    return scores
+
+def candidate_similarity(vectors):
+    """Pairwise cosine similarity of the candidates, computed once per candidate set for MMR"""
+    unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1), 1e-12)[:, None]
+    return unit @ unit.T
+
+def mmr_order(similarity, scores, k, diversity=0.0):
+    """Positions of k candidates picked by maximal marginal relevance
+    
+    Each pick maximizes (1 - diversity) * score - diversity * (highest cosine
+    similarity to an earlier pick), using the candidate_similarity() matrix.
+    diversity 0 is plain score order and does not need the matrix.
+    """
+    k = min(k, len(scores))
+    if diversity <= 0 or k <= 1:
+        return np.argsort(-scores, kind="stable")[:k]
+    
+    selected = [int(np.argmax(scores))]
+    closest = similarity[selected[0]].copy()
+    available = np.ones(len(scores), dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < k:
+        marginal = np.where(available, (1 - diversity) * scores - diversity * closest, -np.inf)
+        pick = int(np.argmax(marginal))
+        selected.append(pick)
+        available[pick] = False
+        np.maximum(closest, similarity[pick], out=closest)
+    return np.array(selected)
+
+def rerank(results, query, vectors, k, weights=None, magnitude_scale=None, threshold=None, diversity=0.0,
+           metric="cosine", normalize=False, similarity=None):
+    """Rescore candidates locally and return the best k as search results
+    
+    Candidates scoring below threshold are dropped before selection. With
+    diversity, similarity is the candidate_similarity() matrix (computed here if
+    not given). Each result keeps the API's score as "api_score".
+    """
+    if not results:
+        return []
+    scores = rescore(query, vectors, weights, magnitude_scale, metric, normalize)
+    keep = np.flatnonzero(scores >= threshold) if threshold is not None else np.arange(len(scores))
+    if diversity > 0:
+        similarity = candidate_similarity(vectors) if similarity is None else similarity
+        if len(keep) < len(scores):
+            similarity = similarity[np.ix_(keep, keep)]
+    order = keep[mmr_order(similarity, scores[keep], k, diversity)]
+    return [{**results[i], "score": float(scores[i]), "api_score": results[i].get("score")} for i in order.tolist()]
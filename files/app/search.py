@@ -1,11 +1,30 @@
 import streamlit as st
+import altair as alt
 import requests
 import json
 import pandas as pd
 import numpy as np
 import time
+from concurrent.futures import ThreadPoolExecutor
+import api_client
+from batch_search import (
+    DEFAULT_MAX_IN_FLIGHT, QUERY_FILE_TYPES, combine_results, latency_summary, post_search, read_query_file, search_many
+)
+from benchmark import local_ground_truth, query_vectors, run_ef_sweep, server_ground_truth
+from filters import FILTER_FIELDS, FILTER_OPERATORS, filter_results, parse_conditions, payload_filter
+from lexical import RRF_K, get_keyword_index, reciprocal_rank_fusion
+from local_search import LOCAL_METRICS, LocalIndex, load_vectors, search_response
+from param_sweep import VECTOR_SPACES, embed_query, overlap_at_k, parse_ef_values, sweep_variants
+from rerank import (
+    DEFAULT_OVERFETCH, candidate_similarity, candidate_vectors, overfetch_payload, rerank, rerank_metric
+)
+from search_cache import get_search_cache, search_cache_key
+from search_pages import new_paging, next_page, start_prefetch
 from utils import SEARCH_API, card_container, render_stats
 
+# Result cards rendered per page in the Card View
+CARDS_PER_PAGE = 10
+
 def render_search_tab():
     """Render the Search Collection tab with dark theme styling"""
     st.header("Search Collection")
@@ -17,6 +36,14 @@ def render_search_tab():
     # Results are displayed in the main results_area created in search_form
     if 'search_results' in st.session_state:
         display_search_results(st.session_state.search_results)
+    elif 'batch_search' in st.session_state:
+        display_batch_results(st.session_state.batch_search)
+    elif 'param_sweep' in st.session_state:
+        display_param_sweep(st.session_state.param_sweep)
+    
+    # Recall/latency benchmark for the HNSW search parameter
+    with st.expander("Recall / Latency Benchmark"):
+        render_benchmark()
 
 def search_form():
     """Render the search form with dark theme styling"""
@@ -30,7 +57,7 @@ def search_form():
     with col2:
         query_input_method = st.radio(
             "Query Input Method",
-            ["Text Query", "Vector Query"],
+            ["Text Query", "Vector Query", "Batch File"],
             index=0,
             horizontal=True
         )
@@ -38,14 +65,60 @@ def search_form():
     # Query input based on selected method
     query_text = None
     query_vector = None
+    query_file = None
+    compare_variants = False
+    hybrid_search = False
     
-    if query_input_method == "Text Query":
+    if query_input_method == "Batch File":
+        col1, col2 = st.columns([3, 1])
+        
+        with col1:
+            query_file = st.file_uploader(
+                "Query File",
+                type=QUERY_FILE_TYPES,
+                help="TXT with one query per line, JSONL/JSON with query_text or query_vector per record, "
+                     "or CSV with a query_text, query or text column"
+            )
+        
+        with col2:
+            batch_max_in_flight = st.number_input(
+                "Concurrent Searches", min_value=1, max_value=64, value=DEFAULT_MAX_IN_FLIGHT,
+                help="Number of search requests kept in flight at once"
+            )
+    elif query_input_method == "Text Query":
         query_text = st.text_area(
             "Search Query", 
             height=100,
             placeholder="Enter your search query here...",
             help="Enter text to search for similar documents in the collection"
         )
+        
+        hybrid_search = st.checkbox(
+            "Hybrid keyword + vector search",
+            value=False,
+            help="Fuse vector results with the local BM25 keyword index (built from the Index tab) by reciprocal-rank "
+                 "fusion; helps exact terms such as IDs and error codes"
+        )
+        
+        compare_variants = st.checkbox(
+            "Compare parameter variants",
+            value=False,
+            help="Embed the query once, then search it with several EF values and vector spaces side by side"
+        )
+        if compare_variants:
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                ef_values = parse_ef_values(st.text_input(
+                    "EF values (native search)", value="32, 64, 128, 256",
+                    help="Comma-separated EF values, each searched with native search"
+                ))
+            
+            with col2:
+                sweep_spaces = st.multiselect(
+                    "Vector spaces (custom search)", VECTOR_SPACES, default=["cosine"],
+                    help="Each vector space is searched with the custom options below"
+                )
     else:
         vector_input = st.text_area(
             "Vector (JSON array format)",
@@ -92,6 +165,37 @@ def search_form():
     
     # Advanced search options in an expander
     with st.expander("Advanced Search Options"):
+        use_result_cache = st.checkbox(
+            "Use Result Cache",
+            value=True,
+            help="Serve identical recent searches from the shared result cache; indexing a collection clears its entries"
+        )
+        
+        # Local rerank of overfetched candidates; it applies to single remote searches only. The
+        # search target is picked further down, so its value is read from session state
+        local_target = (st.session_state.get("local_index_upload") is not None
+                        and st.session_state.get("search_target") == "Local exact index")
+        rerank_blocked = query_input_method == "Batch File" or hybrid_search or compare_variants or local_target
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            local_rerank = st.checkbox(
+                "Rerank Locally",
+                value=False,
+                disabled=rerank_blocked,
+                help="Fetch extra candidates with their vectors once, then apply dimension weights, magnitude weighting, "
+                     "threshold and diversity on this machine; adjusting them re-ranks without another request"
+            ) and not rerank_blocked
+            if rerank_blocked:
+                st.caption("Not available with batch files, hybrid search, parameter comparisons or the local exact index")
+        
+        with col2:
+            overfetch_factor = st.number_input(
+                "Candidates per Result", min_value=1, max_value=20, value=DEFAULT_OVERFETCH,
+                disabled=not local_rerank,
+                help="The rerank fetches Result Limit x this many candidates"
+            )
+        
         if use_native_search:
             # HNSW search parameters for native search
             ef_param = st.number_input(
@@ -156,6 +260,7 @@ def search_form():
                     )
                 
                 # Dimension weights
+                weights = None
                 st.subheader("Dimension Weights")
                 use_dimension_weights = st.checkbox(
                     "Use Dimension Weights", 
@@ -180,6 +285,95 @@ def search_form():
                             st.warning("Invalid JSON format for weights")
                             weights = None
     
+    # Metadata filters sent with the search and re-checked on the results
+    with st.expander("Metadata Filters"):
+        st.caption("Only documents matching every row are searched. Use \"min, max\" for between (either side may be empty) "
+                   "and a comma-separated list for in.")
+        filter_rows = st.data_editor(
+            pd.DataFrame({"field": pd.Series(dtype=str), "operator": pd.Series(dtype=str), "value": pd.Series(dtype=str)}),
+            column_config={
+                "field": st.column_config.TextColumn("Field", help=f"Payload field, e.g. {', '.join(FILTER_FIELDS)}"),
+                "operator": st.column_config.SelectboxColumn("Operator", options=FILTER_OPERATORS),
+                "value": st.column_config.TextColumn("Value"),
+            },
+            num_rows="dynamic",
+            hide_index=True,
+            use_container_width=True,
+            key="search_filter_rows"
+        )
+        filter_conditions, filter_errors = parse_conditions(filter_rows.to_dict("records"))
+        for error in filter_errors:
+            st.warning(error)
+    
+    # Prepare the search payload shared by single and batch searches
+    base_payload = {
+        "collection_name": search_collection,
+        "limit": limit,
+        "score_all_documents": score_all_documents,
+        "use_native_search": use_native_search
+    }
+    
+    # Add advanced options based on search mode
+    if use_native_search:
+        # Native search options
+        base_payload["hnsw"] = {
+            "ef_construction": ef_param
+        }
+    else:
+        # Custom search options
+        base_payload["vector_space"] = vector_space
+        
+        # Add preprocessing if configured
+        base_payload["preprocessing"] = {
+            "normalize": normalize
+        }
+        
+        if magnitude_weighting:
+            base_payload["preprocessing"]["magnitude_weighting"] = magnitude_weighting
+            base_payload["preprocessing"]["scale_factor"] = scale_factor
+        
+        # Add threshold if configured
+        if use_threshold:
+            base_payload["threshold"] = {
+                "threshold": threshold_value
+            }
+        
+        # Add dimension weights if configured
+        if use_dimension_weights and weights:
+            base_payload["dimension_weights"] = {
+                "weights": weights
+            }
+    
+    if filter_conditions:
+        base_payload["filter"] = payload_filter(filter_conditions)
+    
+    # Local exact search over an exported embedding matrix
+    with st.expander("Local Exact Search"):
+        st.write("Load an embedding export (.npz from the Embed tab, or .npy) to search it exactly on this machine, "
+                 "as ground truth or as a fallback when the API is unreachable.")
+        local_file = st.file_uploader("Embedding File", type=["npz", "npy"], key="local_index_upload")
+        local_index = load_local_index(local_file)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            search_target = st.radio(
+                "Search Target",
+                ["Remote API", "Local exact index"],
+                horizontal=True,
+                disabled=local_index is None,
+                key="search_target",
+                help="The remote API falls back to the local index when it cannot be reached"
+            )
+        
+        with col2:
+            local_metric = st.selectbox(
+                "Local Vector Space",
+                LOCAL_METRICS,
+                index=LOCAL_METRICS.index(vector_space) if not use_native_search and vector_space in LOCAL_METRICS else 0,
+                help="Similarity used by the local engine"
+            )
+    
     # Search button
     search_button = st.button("Search Collection", type="primary", use_container_width=True)
     
@@ -189,18 +383,40 @@ def search_form():
     if search_button:
         if not search_collection:
             st.warning("Please enter a collection name")
+        elif query_input_method == "Batch File":
+            if query_file is None:
+                st.warning("Please upload a query file")
+            else:
+                run_batch_search(query_file, base_payload, batch_max_in_flight, use_result_cache, filter_conditions)
         elif not query_text and not query_vector:
             st.warning("Please provide either a text query or a vector query")
+        elif local_index is not None and search_target == "Local exact index":
+            try:
+                run_local_search(local_index, query_text, query_vector, limit, local_metric, search_collection,
+                                 conditions=filter_conditions)
+            except Exception as e:
+                st.error(f"Local search failed: {str(e)}")
+        elif hybrid_search:
+            try:
+                run_hybrid_search(query_text, base_payload, use_result_cache, filter_conditions)
+            except Exception as e:
+                st.error(f"Hybrid search failed: {str(e)}")
+        elif compare_variants:
+            if not ef_values and not sweep_spaces:
+                st.warning("Please choose at least one EF value or vector space to compare")
+            else:
+                run_param_sweep(query_text, base_payload, ef_values, sweep_spaces, use_result_cache, filter_conditions)
+        elif local_rerank:
+            try:
+                with st.spinner("Fetching candidates..."):
+                    run_rerank_search(query_text, query_vector, base_payload, overfetch_factor, use_result_cache,
+                                      filter_conditions)
+            except Exception as e:
+                st.error(f"Rerank search failed: {str(e)}")
         else:
             with st.spinner("Searching..."):
                 try:
-                    # Prepare the search payload
-                    payload = {
-                        "collection_name": search_collection,
-                        "limit": limit,
-                        "score_all_documents": score_all_documents,
-                        "use_native_search": use_native_search
-                    }
+                    payload = dict(base_payload)
                     
                     # Add query text or vector
                     if query_text:
@@ -208,48 +424,28 @@ def search_form():
                     elif query_vector:
                         payload["query_vector"] = query_vector
                     
-                    # Add advanced options based on search mode
-                    if use_native_search:
-                        # Native search options
-                        payload["hnsw"] = {
-                            "ef_construction": ef_param
-                        }
-                    else:
-                        # Custom search options
-                        payload["vector_space"] = vector_space
-                        
-                        # Add preprocessing if configured
-                        payload["preprocessing"] = {
-                            "normalize": normalize
-                        }
-                        
-                        if magnitude_weighting:
-                            payload["preprocessing"]["magnitude_weighting"] = magnitude_weighting
-                            payload["preprocessing"]["scale_factor"] = scale_factor
-                        
-                        # Add threshold if configured
-                        if use_threshold:
-                            payload["threshold"] = {
-                                "threshold": threshold_value
-                            }
-                        
-                        # Add dimension weights if configured
-                        if use_dimension_weights and weights:
-                            payload["dimension_weights"] = {
-                                "weights": weights
-                            }
+                    # Serve identical searches from the shared result cache
+                    search_cache = get_search_cache()
+                    cache_key = search_cache_key(payload)
+                    start_time = time.time()
+                    cached_result = search_cache.get(cache_key) if use_result_cache else None
+                    if cached_result is not None:
+                        paging = new_paging(payload, cached_result.get("results", []), filter_conditions)
+                        cached_result, notice = enforce_filter(cached_result, filter_conditions)
+                        store_search_results(cached_result, query_text, search_collection, time.time() - start_time, True,
+                                             notice, paging)
+                        st.rerun()
                     
                     # Make the API request
-                    start_time = time.time()
-                    response = requests.post(SEARCH_API, json=payload)
+                    response = api_client.post(SEARCH_API, json=payload)
                     request_time = time.time() - start_time
                     
                     if response.status_code == 200:
                         result = response.json()
-                        st.session_state.search_results = result
-                        st.session_state.search_query = query_text or "Vector Query"
-                        st.session_state.search_collection = search_collection
-                        st.session_state.search_time = request_time
+                        search_cache.put(cache_key, result)
+                        paging = new_paging(payload, result.get("results", []), filter_conditions)
+                        result, notice = enforce_filter(result, filter_conditions)
+                        store_search_results(result, query_text, search_collection, request_time, False, notice, paging)
                         
                         # Rerun to display results in clean state
                         st.rerun()
@@ -272,12 +468,558 @@ def search_form():
                                 st.info("Ensure you've provided either a text query or a valid vector query.")
                             elif response.status_code >= 500:
                                 st.info("There was a server error. Please try again later or try a simpler query.")
+                except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                    if local_index is not None:
+                        # Offline fallback to the local exact index
+                        try:
+                            run_local_search(local_index, query_text, query_vector, limit, local_metric, search_collection,
+                                             notice="The search API could not be reached; results come from the local exact index.",
+                                             conditions=filter_conditions)
+                        except Exception as local_error:
+                            with results_area:
+                                st.error(f"The search API could not be reached and local search failed: {str(local_error)}")
+                    with results_area:
+                        if isinstance(e, requests.exceptions.Timeout):
+                            st.error("The search request timed out.")
+                            st.info("The API did not respond within the configured timeout. Try a smaller limit or try again later.")
+                        else:
+                            st.error(f"An error occurred: {str(e)}")
+                            st.info("Check your network connection and ensure the API endpoint is accessible.")
                 except Exception as e:
                     with results_area:
                         st.error(f"An error occurred: {str(e)}")
                         st.info("Check your network connection and ensure the API endpoint is accessible.")
 
 
+def store_search_results(result, query_text, collection_name, search_time, from_cache, notice=None, paging=None,
+                         legs=None, rerank_state=None):
+    """Keep a search response and its context in session state for display
+    
+    With paging state from new_paging(), further pages can be loaded; the next
+    one starts prefetching right away. legs maps each leg of a hybrid search to
+    its time in milliseconds. rerank_state holds the candidates and vectors the
+    results are re-ranked from on every rerun.
+    """
+    st.session_state.search_results = result
+    st.session_state.search_paging = paging
+    if paging:
+        start_prefetch(paging)
+    st.session_state.search_notice = notice
+    st.session_state.search_query = query_text or "Vector Query"
+    st.session_state.search_collection = collection_name
+    st.session_state.search_time = search_time
+    st.session_state.search_from_cache = from_cache
+    st.session_state.search_legs = legs
+    st.session_state.search_rerank = rerank_state
+    st.session_state.pop("batch_search", None)
+    st.session_state.pop("param_sweep", None)
+    
+    # Views derived from the previous result set are no longer valid
+    st.session_state.search_result_views = {}
+    st.session_state.card_page = 1
+
+def enforce_filter(result, conditions):
+    """Drop results that do not match the metadata filter, for APIs that ignore it
+    
+    Returns (result, notice); the notice is None unless something was dropped.
+    """
+    results = result.get("results", [])
+    kept = filter_results(results, conditions)
+    if len(kept) == len(results):
+        return result, None
+    notice = (f"The API returned {len(results) - len(kept)} results that do not match the metadata filters; "
+              "they were removed, so fewer results than the limit may be shown.")
+    return {**result, "results": kept, "total_found": len(kept)}, notice
+
+def recheck_outcomes(outcomes, conditions):
+    """Apply enforce_filter to every successful (result, latency, error, from_cache) outcome
+    
+    Returns (outcomes, notice); the notice is None unless results were dropped.
+    """
+    dropped = 0
+    for i, (result, latency, error, from_cache) in outcomes.items():
+        if error is None and conditions:
+            kept, notice = enforce_filter(result, conditions)
+            if notice:
+                dropped += len(result.get("results", [])) - len(kept["results"])
+                outcomes[i] = (kept, latency, error, from_cache)
+    notice = (f"The API returned {dropped} results that do not match the metadata filters; they were removed."
+              if dropped else None)
+    return outcomes, notice
+
+def result_view(name, build):
+    """Build a derived view of the current results once and reuse it on later reruns"""
+    views = st.session_state.setdefault("search_result_views", {})
+    if name not in views:
+        views[name] = build()
+    return views[name]
+
+def results_table(results):
+    """Table View rows for a list of results"""
+    table_data = []
+    for i, item in enumerate(results):
+        score = item.get("score", 0)
+        id = item.get("id", "")
+        payload = item.get("payload", {})
+        
+        text = payload.get("text", "No text available")
+        # Truncate text for table view
+        text_preview = text[:100] + "..." if len(text) > 100 else text
+        
+        # Get a few key metadata fields
+        source = payload.get("source", "")
+        category = payload.get("category", "")
+        
+        table_data.append({
+            "Rank": i+1,
+            "Score": round(score, 4),
+            "ID": id,
+            "Text Preview": text_preview,
+            "Source": source,
+            "Category": category
+        })
+    return pd.DataFrame(table_data)
+
+def results_csv(results):
+    """CSV export of a list of results with every payload field as a column"""
+    return pd.DataFrame([{
+        "rank": i+1,
+        "score": item.get("score", 0),
+        "id": item.get("id", ""),
+        "text": item.get("payload", {}).get("text", ""),
+        **{k: v for k, v in item.get("payload", {}).items() if k != "text"}
+    } for i, item in enumerate(results)]).to_csv(index=False)
+
+def render_result_card(rank, item):
+    """Render one search result as a card"""
+    score = item.get("score", 0)
+    result_id = item.get("id", "")
+    payload = item.get("payload", {})
+    
+    # Extract text and metadata from payload
+    text = payload.get("text", "No text available")
+    
+    # Create a regular Streamlit container instead of HTML
+    with st.container():
+        # Header with result number and score
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.markdown(f"### Result {rank}")
+        with col2:
+            st.markdown(f"<p style='text-align: right; color: #4B56D2; font-weight: bold; font-size: 1.2rem;'>{score:.4f}</p>", unsafe_allow_html=True)
+        
+        # Text content
+        st.markdown(f"<div style='background-color: #1a1a2e; padding: 10px; border-radius: 5px; border-left: 3px solid #4B56D2;'>{text}</div>", unsafe_allow_html=True)
+        
+        # ID information, with per-leg ranks for hybrid results
+        ranks = "".join(f" · {leg} rank {rank}" for leg, rank in item.get("ranks", {}).items())
+        st.markdown(f"<small>ID: {result_id}{ranks}</small>", unsafe_allow_html=True)
+        
+        # Metadata
+        metadata = {k: v for k, v in payload.items() if k != "text"}
+        if metadata:
+            with st.expander("Metadata"):
+                st.json(metadata)
+        
+        st.divider()
+
+def load_local_index(uploaded_file):
+    """Load an uploaded embedding file into the session's local exact index, once per file"""
+    if uploaded_file is None:
+        st.session_state.pop("local_index", None)
+        st.session_state.pop("local_index_source", None)
+        return None
+    source = (uploaded_file.name, uploaded_file.size)
+    if st.session_state.get("local_index_source") != source:
+        try:
+            matrix, texts, metadata = load_vectors(uploaded_file)
+        except Exception as e:
+            st.error(f"Could not load {uploaded_file.name}: {str(e)}")
+            st.session_state.pop("local_index", None)
+            st.session_state.pop("local_index_source", None)
+            return None
+        st.session_state.local_index = LocalIndex(matrix, texts, metadata)
+        st.session_state.local_index_source = source
+    local_index = st.session_state.get("local_index")
+    if local_index is not None:
+        st.caption(f"{len(local_index)} vectors x {local_index.dim} dimensions"
+                   + (", with texts" if local_index.texts is not None else "")
+                   + (f" and metadata ({', '.join(map(str, local_index.metadata.columns))})"
+                      if local_index.metadata is not None else ""))
+    return local_index
+
+def run_local_search(local_index, query_text, query_vector, limit, metric, collection_name, notice=None, conditions=None):
+    """Search the local exact index, embedding a text query through the embedding cache
+    
+    Metadata filter conditions are applied as a row mask before ranking.
+    """
+    start_time = time.time()
+    if query_vector is None:
+        query_vector, _ = embed_query(query_text)
+    result = search_response(local_index, query_vector, limit, metric, conditions)
+    store_search_results(result, query_text, f"{collection_name} (local exact index)", time.time() - start_time, False, notice)
+    st.rerun()
+
+def run_hybrid_search(query_text, base_payload, use_result_cache=True, conditions=None):
+    """Fuse vector search results with local BM25 keyword results by reciprocal-rank fusion
+    
+    The vector request runs in the background while the keyword index is
+    searched, and each leg is timed separately.
+    """
+    collection_name = base_payload["collection_name"]
+    limit = base_payload["limit"]
+    start_time = time.time()
+    
+    # Vector leg: result cache, else the search API on a background thread of its own,
+    # so it does not queue behind other sessions' page prefetches
+    payload = {**base_payload, "query_text": query_text}
+    search_cache = get_search_cache()
+    cache_key = search_cache_key(payload)
+    vector_result = search_cache.get(cache_key) if use_result_cache else None
+    vector_future = None
+    if vector_result is None:
+        vector_executor = ThreadPoolExecutor(max_workers=1)
+        vector_future = vector_executor.submit(post_search, payload, api_client.get_session())
+        vector_executor.shutdown(wait=False)
+    else:
+        vector_time = time.time() - start_time
+    
+    # Keyword leg over the local BM25 index
+    keyword_start = time.time()
+    keyword_index = get_keyword_index()
+    keyword_results = keyword_index.search(collection_name, query_text, limit, conditions)
+    keyword_time = time.time() - keyword_start
+    
+    if vector_future is not None:
+        vector_result, vector_time = vector_future.result()
+        search_cache.put(cache_key, vector_result)
+    vector_result, notice = enforce_filter(vector_result, conditions)
+    
+    fused = reciprocal_rank_fusion({"vector": vector_result.get("results", []), "keyword": keyword_results}, limit)
+    if not keyword_index.count(collection_name):
+        notice = (f"The keyword index has no documents for '{collection_name}', so only vector results were fused. "
+                  "Index documents with \"Update keyword index\" enabled to build it.")
+    search_time = time.time() - start_time
+    result = {
+        "results": fused,
+        "total_found": len(fused),
+        "metric_used": f"hybrid (RRF, k={RRF_K})",
+        "search_time_ms": round(search_time * 1000, 2),
+    }
+    store_search_results(result, query_text, collection_name, search_time, False, notice, legs={
+        "Vector Search": round(vector_time * 1000, 2),
+        "Keyword Search (BM25)": round(keyword_time * 1000, 2),
+    })
+    st.rerun()
+
+def run_rerank_search(query_text, query_vector, base_payload, overfetch_factor, use_result_cache=True, conditions=None):
+    """Fetch limit x overfetch_factor candidates with vectors once and keep them for local reranking
+    
+    The candidate vectors and the query vector are kept in session state, so the
+    rerank controls rescore them on each rerun without another request.
+    """
+    start_time = time.time()
+    payload = overfetch_payload(base_payload, overfetch_factor)
+    if query_text:
+        payload["query_text"] = query_text
+    else:
+        payload["query_vector"] = query_vector
+    
+    search_cache = get_search_cache()
+    cache_key = search_cache_key(payload)
+    result = search_cache.get(cache_key) if use_result_cache else None
+    from_cache = result is not None
+    if result is None:
+        result, _ = post_search(payload)
+        search_cache.put(cache_key, result)
+    result, notice = enforce_filter(result, conditions)
+    
+    # Vectors come with the candidates, or from the embedding cache by text
+    candidates = result.get("results", [])
+    vectors = candidate_vectors(candidates)
+    candidates = [{key: value for key, value in item.items() if key != "vector"} for item in candidates]
+    if query_vector is None:
+        query_vector, _ = embed_query(query_text)
+    query_vector = np.asarray(query_vector, dtype=np.float32)
+    if candidates and vectors.shape[1] != len(query_vector):
+        raise ValueError(f"Candidate vectors have {vectors.shape[1]} dimensions but the query has {len(query_vector)}")
+    
+    preprocessing = base_payload.get("preprocessing", {})
+    rerank_state = {
+        "candidates": candidates,
+        "vectors": vectors,
+        "query_vector": query_vector,
+        "limit": base_payload["limit"],
+        # Start from the custom options chosen in the form
+        "weights": base_payload.get("dimension_weights", {}).get("weights"),
+        "scale_factor": preprocessing.get("scale_factor") if preprocessing.get("magnitude_weighting") else None,
+        "threshold": base_payload.get("threshold", {}).get("threshold"),
+        # Score with the selected vector space where the rerank supports it
+        "vector_space": base_payload.get("vector_space"),
+        "metric": rerank_metric(base_payload.get("vector_space")),
+        "normalize": preprocessing.get("normalize", False),
+        # Pairwise candidate similarities for MMR, built on first use
+        "similarity": None,
+        "params": None,
+    }
+    store_search_results({**result, "results": candidates}, query_text, base_payload["collection_name"],
+                         time.time() - start_time, from_cache, notice, rerank_state=rerank_state)
+    st.rerun()
+
+def render_rerank_controls(rerank_state, result):
+    """Rerank controls over the kept candidates; returns the result re-ranked with the current settings"""
+    candidates = rerank_state["candidates"]
+    metric = rerank_state["metric"]
+    with st.expander("Local Rerank", expanded=True):
+        if rerank_state["vector_space"] is None:
+            st.caption("Native search results are rescored with cosine similarity.")
+        elif rerank_state["vector_space"] != metric:
+            st.caption(f"The {rerank_state['vector_space']} vector space is not available locally; "
+                       "candidates are rescored with cosine similarity.")
+        else:
+            st.caption(f"Candidates are rescored with {metric}"
+                       + (" on normalized vectors" if rerank_state["normalize"] else "")
+                       + (" as 1 / (1 + distance)" if metric in ("euclidean", "manhattan") else "") + ".")
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            weights_input = st.text_area(
+                "Dimension Weights (JSON array)",
+                value=json.dumps(rerank_state["weights"]) if rerank_state["weights"] else "",
+                placeholder="[1.0, 0.8, 1.2, ...]",
+                help="Non-negative weight per dimension; leave empty to weight every dimension equally"
+            )
+            use_magnitude = st.checkbox("Magnitude Weighting", value=rerank_state["scale_factor"] is not None)
+            scale_factor = st.slider(
+                "Scale Factor", min_value=0.1, max_value=10.0, value=float(rerank_state["scale_factor"] or 1.0), step=0.1,
+                disabled=not use_magnitude, help="Exponent on each candidate's relative vector magnitude"
+            )
+        
+        with col2:
+            use_threshold = st.checkbox("Use Similarity Threshold", value=rerank_state["threshold"] is not None)
+            threshold = st.slider(
+                "Threshold Value", min_value=0.0, max_value=1.0, value=float(rerank_state["threshold"] or 0.7),
+                step=0.01, disabled=not use_threshold
+            )
+            diversity = st.slider(
+                "Diversity (MMR)", min_value=0.0, max_value=1.0, value=0.0, step=0.05,
+                help="Trade relevance for variety: each pick is penalized by its similarity to earlier picks"
+            )
+        
+        weights = None
+        if weights_input.strip():
+            try:
+                weights = np.asarray(json.loads(weights_input), dtype=np.float32)
+            except (json.JSONDecodeError, TypeError, ValueError):
+                st.warning("Weights must be a JSON array of numbers; using equal weights")
+            else:
+                if weights.shape != (rerank_state["vectors"].shape[1],) or (weights < 0).any():
+                    st.warning(f"Weights must be {rerank_state['vectors'].shape[1]} non-negative numbers; using equal weights")
+                    weights = None
+        
+        start_time = time.time()
+        if diversity and rerank_state["similarity"] is None and len(candidates):
+            rerank_state["similarity"] = candidate_similarity(rerank_state["vectors"])
+        reranked = rerank(
+            candidates, rerank_state["query_vector"], rerank_state["vectors"], rerank_state["limit"], weights,
+            scale_factor if use_magnitude else None, threshold if use_threshold else None, diversity,
+            metric, rerank_state["normalize"], rerank_state["similarity"]
+        )
+        st.caption(f"Re-ranked {len(candidates)} candidates to {len(reranked)} results in "
+                   f"{round((time.time() - start_time) * 1000, 2)} ms")
+    
+    # Derived views are rebuilt when the settings change
+    params = (weights_input, use_magnitude, scale_factor, use_threshold, threshold, diversity)
+    if params != rerank_state["params"]:
+        rerank_state["params"] = params
+        st.session_state.search_result_views = {}
+        st.session_state.card_page = 1
+    
+    return {
+        **result,
+        "results": reranked,
+        "total_found": len(reranked),
+        "metric_used": f"{'weighted ' if weights is not None else ''}{metric} (local rerank{', MMR' if diversity else ''})",
+    }
+
+def run_batch_search(query_file, base_payload, max_in_flight, use_result_cache=True, conditions=None):
+    """Search every query in an uploaded file concurrently and keep the combined results"""
+    try:
+        queries, skipped = read_query_file(query_file)
+    except (ValueError, json.JSONDecodeError) as e:
+        st.error(f"Invalid query file: {str(e)}")
+        return
+    if not queries:
+        st.warning("No usable queries found in the file")
+        return
+    if skipped:
+        st.info(f"Skipped {skipped} records that are not a text or vector query")
+    
+    search_cache = get_search_cache()
+    payloads = [{**base_payload, **query} for query in queries]
+    cache_keys = [search_cache_key(payload) for payload in payloads]
+    outcomes = {}
+    
+    # Cached queries are answered up front; the rest go to the worker pool
+    pending = []
+    for i, payload in enumerate(payloads):
+        cached_result = search_cache.get(cache_keys[i]) if use_result_cache else None
+        if cached_result is not None:
+            outcomes[i] = (cached_result, None, None, True)
+        else:
+            pending.append((i, payload))
+    
+    # Progress bar
+    progress_bar = st.progress(0)
+    start_time = time.time()
+    for i, result, latency, error in search_many(pending, max_in_flight):
+        if error is None:
+            search_cache.put(cache_keys[i], result)
+        outcomes[i] = (result, latency, error, False)
+        progress_bar.progress(len(outcomes) / len(queries), text=f"Query {len(outcomes)}/{len(queries)}")
+    progress_bar.progress(1.0)
+    outcomes, filter_notice = recheck_outcomes(outcomes, conditions)
+    
+    latencies = [latency for _, latency, error, _ in outcomes.values() if latency is not None]
+    st.session_state.batch_search = {
+        "notice": filter_notice,
+        "collection": base_payload["collection_name"],
+        "queries": len(queries),
+        "failed": sum(1 for _, _, error, _ in outcomes.values() if error is not None),
+        "cached": sum(1 for *_, from_cache in outcomes.values() if from_cache),
+        "wall_time": time.time() - start_time,
+        "latency": latency_summary(latencies),
+        "table": combine_results(queries, outcomes),
+    }
+    st.session_state.pop("search_results", None)
+    st.session_state.pop("param_sweep", None)
+    st.rerun()
+
+def run_param_sweep(query_text, base_payload, ef_values, vector_spaces, use_result_cache=True, conditions=None):
+    """Embed a query once and search it concurrently under each parameter variant"""
+    try:
+        with st.spinner("Embedding query..."):
+            query_vector, embedding_cached = embed_query(query_text)
+    except Exception as e:
+        st.error(f"Could not embed the query: {str(e)}")
+        return
+    
+    variants = sweep_variants(base_payload, query_vector, ef_values, vector_spaces)
+    search_cache = get_search_cache()
+    cache_keys = [search_cache_key(payload) for _, payload in variants]
+    outcomes = {}
+    
+    pending = []
+    for i, (_, payload) in enumerate(variants):
+        cached_result = search_cache.get(cache_keys[i]) if use_result_cache else None
+        if cached_result is not None:
+            outcomes[i] = (cached_result, None, None, True)
+        else:
+            pending.append((i, payload))
+    
+    with st.spinner(f"Searching {len(variants)} variants..."):
+        for i, result, latency, error in search_many(pending, len(variants)):
+            if error is None:
+                search_cache.put(cache_keys[i], result)
+            outcomes[i] = (result, latency, error, False)
+    outcomes, filter_notice = recheck_outcomes(outcomes, conditions)
+    
+    st.session_state.param_sweep = {
+        "notice": filter_notice,
+        "query": query_text,
+        "collection": base_payload["collection_name"],
+        "embedding_cached": embedding_cached,
+        "variants": [(label, *outcomes[i]) for i, (label, _) in enumerate(variants)],
+    }
+    st.session_state.pop("search_results", None)
+    st.session_state.pop("batch_search", None)
+    st.rerun()
+
+def display_param_sweep(sweep):
+    """Display the results of each parameter variant side by side"""
+    st.markdown(f"**Parameter comparison** for \"{sweep['query']}\" over `{sweep['collection']}` "
+                f"(query embedded once{', from cache' if sweep['embedding_cached'] else ''})")
+    if sweep.get("notice"):
+        st.warning(sweep["notice"])
+    
+    # Summary across variants, with overlap measured against the first variant
+    variants = sweep["variants"]
+    reference_ids = None
+    summary = []
+    for label, result, latency, error, from_cache in variants:
+        items = (result or {}).get("results", [])
+        ids = [item.get("id") for item in items]
+        if reference_ids is None and error is None:
+            reference_ids = ids
+        overlap = overlap_at_k(reference_ids, ids) if error is None else None
+        summary.append({
+            "Variant": label,
+            "Latency (ms)": "cached" if from_cache else (round(latency * 1000, 2) if latency is not None else None),
+            "Results": len(items),
+            "Top Score": round(items[0].get("score", 0), 4) if items else None,
+            "Overlap with first": round(overlap, 2) if overlap is not None else None,
+            "Error": str(error) if error is not None else "",
+        })
+    st.dataframe(pd.DataFrame(summary), use_container_width=True, hide_index=True)
+    
+    # Side-by-side result lists, three per row
+    for row_start in range(0, len(variants), 3):
+        columns = st.columns(3)
+        for column, (label, result, latency, error, from_cache) in zip(columns, variants[row_start:row_start + 3]):
+            with column:
+                st.markdown(f"**{label}**")
+                if error is not None:
+                    st.error(str(error))
+                    continue
+                st.dataframe(pd.DataFrame([{
+                    "Rank": rank,
+                    "Score": round(item.get("score", 0), 4),
+                    "ID": item.get("id", ""),
+                    "Text": item.get("payload", {}).get("text", "")[:60],
+                } for rank, item in enumerate((result or {}).get("results", []), start=1)]),
+                    use_container_width=True, hide_index=True)
+
+def display_batch_results(batch):
+    """Display the combined results and latency percentiles of a batch search"""
+    st.markdown(f"**Batch search** over `{batch['collection']}`: {batch['queries']} queries in "
+                f"{batch['wall_time']:.2f} s ({batch['cached']} from cache, {batch['failed']} failed)")
+    if batch.get("notice"):
+        st.warning(batch["notice"])
+    
+    latency = batch["latency"]
+    if latency:
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            render_stats("p50 Latency", f"{latency['p50']} ms", "median request")
+        with col2:
+            render_stats("p95 Latency", f"{latency['p95']} ms", "95th percentile")
+        with col3:
+            render_stats("p99 Latency", f"{latency['p99']} ms", "99th percentile")
+        with col4:
+            render_stats("Throughput", f"{batch['queries'] / max(batch['wall_time'], 1e-9):.1f}/s", "queries per second")
+    
+    table = batch["table"]
+    st.dataframe(table, use_container_width=True, hide_index=True)
+    
+    # Export options
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="Export as CSV",
+            data=table.to_csv(index=False),
+            file_name="batch_search_results.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
+    with col2:
+        st.download_button(
+            label="Export as JSON Lines",
+            data=table.to_json(orient="records", lines=True),
+            file_name="batch_search_results.jsonl",
+            mime="application/jsonl",
+            use_container_width=True
+        )
+
 def display_search_results(result):
     """Display search results with dark theme styling"""
     # Display search context
@@ -289,6 +1031,14 @@ def display_search_results(result):
         </div>
     """, unsafe_allow_html=True)
     
+    if st.session_state.get("search_notice"):
+        st.warning(st.session_state.search_notice)
+    
+    # Rescore the kept candidates with the current rerank settings
+    rerank_state = st.session_state.get("search_rerank")
+    if rerank_state:
+        result = render_rerank_controls(rerank_state, result)
+    
     # Display search statistics
     col1, col2, col3 = st.columns(3)
     
@@ -305,12 +1055,26 @@ def display_search_results(result):
             "similarity algorithm"
         )
     with col3:
-        search_time = result.get("search_time_ms", round(st.session_state.search_time * 1000, 2))
-        render_stats(
-            "Search Time", 
-            f"{search_time} ms",
-            "end-to-end processing"
-        )
+        if st.session_state.get("search_from_cache"):
+            render_stats(
+                "Search Time",
+                f"{round(st.session_state.search_time * 1000, 2)} ms",
+                "served from cache"
+            )
+        else:
+            search_time = result.get("search_time_ms", round(st.session_state.search_time * 1000, 2))
+            render_stats(
+                "Search Time", 
+                f"{search_time} ms",
+                "end-to-end processing"
+            )
+    
+    # Per-leg timings of a hybrid search
+    legs = st.session_state.get("search_legs")
+    if legs:
+        for column, (leg, leg_time) in zip(st.columns(len(legs)), legs.items()):
+            with column:
+                render_stats(leg, f"{leg_time} ms", "hybrid search leg")
     
     # Display results
     results = result.get("results", [])
@@ -319,104 +1083,148 @@ def display_search_results(result):
         st.info("No results found. Try a different query or collection.")
         return
     
-    # Create a tabbed view for results
-    result_tabs = st.tabs(["Card View", "Table View", "Raw JSON"])
+    # Only the selected view is built on each rerun
+    view = st.radio("View", ["Card View", "Table View", "Raw JSON"], horizontal=True, label_visibility="collapsed")
     
-    # Card View - Fixed Version
-    with result_tabs[0]:
-        for i, item in enumerate(results):
-            score = item.get("score", 0)
-            result_id = item.get("id", "")
-            payload = item.get("payload", {})
-            
-            # Extract text and metadata from payload
-            text = payload.get("text", "No text available")
-            
-            # Create a regular Streamlit container instead of HTML
-            with st.container():
-                # Header with result number and score
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.markdown(f"### Result {i+1}")
-                with col2:
-                    st.markdown(f"<p style='text-align: right; color: #4B56D2; font-weight: bold; font-size: 1.2rem;'>{score:.4f}</p>", unsafe_allow_html=True)
-                
-                # Text content
-                st.markdown(f"<div style='background-color: #1a1a2e; padding: 10px; border-radius: 5px; border-left: 3px solid #4B56D2;'>{text}</div>", unsafe_allow_html=True)
-                
-                # ID information
-                st.markdown(f"<small>ID: {result_id}</small>", unsafe_allow_html=True)
-                
-                # Metadata
-                metadata = {k: v for k, v in payload.items() if k != "text"}
-                if metadata:
-                    with st.expander("Metadata"):
-                        st.json(metadata)
-                
-                st.divider()
-    
-    # Table View
-    with result_tabs[1]:
-        # Prepare data for table
-        table_data = []
-        for i, item in enumerate(results):
-            score = item.get("score", 0)
-            id = item.get("id", "")
-            payload = item.get("payload", {})
-            
-            text = payload.get("text", "No text available")
-            # Truncate text for table view
-            text_preview = text[:100] + "..." if len(text) > 100 else text
-            
-            # Get a few key metadata fields
-            source = payload.get("source", "")
-            category = payload.get("category", "")
-            
-            table_data.append({
-                "Rank": i+1,
-                "Score": round(score, 4),
-                "ID": id,
-                "Text Preview": text_preview,
-                "Source": source,
-                "Category": category
-            })
-        
-        # Create and display dataframe
-        df = pd.DataFrame(table_data)
-        st.dataframe(df, use_container_width=True)
-    
-    # Raw JSON
-    with result_tabs[2]:
+    if view == "Card View":
+        pages = (len(results) + CARDS_PER_PAGE - 1) // CARDS_PER_PAGE
+        page = 1
+        if pages > 1:
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key="card_page")
+        start = (page - 1) * CARDS_PER_PAGE
+        for i, item in enumerate(results[start:start + CARDS_PER_PAGE], start=start + 1):
+            render_result_card(i, item)
+    elif view == "Table View":
+        st.dataframe(result_view("table", lambda: results_table(results)), use_container_width=True)
+    else:
         st.json(results)
     
-    # Export options
+    # Load the next page, usually already prefetched in the background
+    paging = st.session_state.get("search_paging")
+    if paging:
+        st.caption(f"Showing {len(results)} results"
+                   + ("; the API ignores offsets, so each page re-requests earlier results"
+                      if paging["offset_supported"] is False else ""))
+        if paging["has_more"] and st.button(f"Load {paging['page_size']} More", use_container_width=True):
+            try:
+                page = filter_results(next_page(paging), paging["conditions"])
+            except Exception as e:
+                st.error(f"Could not load more results: {str(e)}")
+            else:
+                results.extend(page)
+                st.session_state.search_result_views = {}
+                start_prefetch(paging)
+                st.rerun()
+    
+    # Export options, serialized only when asked for
+    if st.checkbox("Prepare exports", value=False):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                label="Export as CSV",
+                data=result_view("csv", lambda: results_csv(results)),
+                file_name="search_results.csv",
+                mime="text/csv",
+                use_container_width=True
+            )
+        
+        with col2:
+            st.download_button(
+                label="Export as JSON",
+                data=result_view("json", lambda: json.dumps(results, indent=2)),
+                file_name="search_results.json",
+                mime="application/json",
+                use_container_width=True
+            )
+
+def render_benchmark():
+    """Run a query set at several EF values and chart recall@k against latency"""
+    st.write("Measure what each EF value buys: recall@k against exact ground truth, and request latency percentiles.")
+    
     col1, col2 = st.columns(2)
+    
     with col1:
-        # CSV export
-        csv_data = pd.DataFrame([{
-            "rank": i+1,
-            "score": item.get("score", 0),
-            "id": item.get("id", ""),
-            "text": item.get("payload", {}).get("text", ""),
-            **{k: v for k, v in item.get("payload", {}).items() if k != "text"}
-        } for i, item in enumerate(results)])
-        
-        csv = csv_data.to_csv(index=False)
-        st.download_button(
-            label="Export as CSV",
-            data=csv,
-            file_name="search_results.csv",
-            mime="text/csv",
-            use_container_width=True
+        collection_name = st.text_input("Collection Name", value="my_collection", key="benchmark_collection")
+        query_file = st.file_uploader(
+            "Query Set", type=QUERY_FILE_TYPES, key="benchmark_queries",
+            help="Same formats as batch search; text queries are embedded once up front"
         )
+        ef_values = parse_ef_values(st.text_input("EF values", value="16, 32, 64, 128, 256", key="benchmark_ef"))
     
     with col2:
-        # JSON export
-        export_data = json.dumps(results, indent=2)
-        st.download_button(
-            label="Export as JSON",
-            data=export_data,
-            file_name="search_results.json",
-            mime="application/json",
-            use_container_width=True
-        )
\ No newline at end of file
+        k = st.number_input("k", min_value=1, max_value=100, value=10, key="benchmark_k")
+        metric = st.selectbox("Vector Space", LOCAL_METRICS, key="benchmark_metric")
+        normalize = st.checkbox(
+            "Normalize Vectors", value=True, key="benchmark_normalize",
+            help="Preprocessing sent with both the ground truth and the benchmarked searches, as in the search form"
+        )
+        local_index = st.session_state.get("local_index")
+        truth_source = st.radio(
+            "Ground Truth",
+            ["Server (score all documents)", "Local exact index"],
+            horizontal=True,
+            disabled=local_index is None,
+            help="The local option uses the index loaded under Local Exact Search and matches results by text"
+        )
+        max_in_flight = st.number_input(
+            "Concurrent Searches", min_value=1, max_value=64, value=1, key="benchmark_in_flight",
+            help="Keep at 1 for undisturbed latencies; raise it to measure under load"
+        )
+    
+    if st.button("Run Benchmark", use_container_width=True):
+        if not collection_name or query_file is None or not ef_values:
+            st.warning("Please provide a collection, a query set and at least one EF value")
+        else:
+            try:
+                queries, _ = read_query_file(query_file)
+                if not queries:
+                    raise ValueError("No usable queries found in the file")
+                preprocessing = {"normalize": normalize}
+                with st.spinner(f"Preparing {len(queries)} query vectors and ground truth..."):
+                    vectors = query_vectors(queries)
+                    if local_index is not None and truth_source == "Local exact index":
+                        truth, key_by = local_ground_truth(local_index, vectors, k, metric), "text"
+                    else:
+                        truth = server_ground_truth(collection_name, vectors, k, metric, max_in_flight, preprocessing)
+                        key_by = "id"
+                
+                # Progress bar
+                progress_bar = st.progress(0)
+                frame = run_ef_sweep(
+                    collection_name, vectors, truth, ef_values, k, max_in_flight, key_by,
+                    on_progress=lambda done, total: progress_bar.progress(done / total, text=f"Search {done}/{total}"),
+                    preprocessing=preprocessing
+                )
+                st.session_state.benchmark = {"frame": frame, "k": k, "queries": len(queries), "collection": collection_name}
+            except Exception as e:
+                st.error(f"Benchmark failed: {str(e)}")
+    
+    if "benchmark" in st.session_state:
+        display_benchmark(st.session_state.benchmark)
+
+def display_benchmark(benchmark):
+    """Show the recall/latency frontier table and chart of a benchmark run"""
+    frame = benchmark["frame"]
+    recall_column = f"recall@{benchmark['k']}"
+    st.markdown(f"**{benchmark['queries']} queries** against `{benchmark['collection']}`. "
+                "Frontier rows are not beaten by any other EF value on both recall and p95 latency.")
+    st.dataframe(frame, use_container_width=True, hide_index=True)
+    # st.scatter_chart needs Streamlit 1.31; Altair ships with Streamlit
+    # Fields are passed explicitly: "p95 (ms)" would parse as shorthand
+    x = alt.X(field="p95 (ms)", type="quantitative")
+    y = alt.Y(field=recall_column, type="quantitative", scale=alt.Scale(zero=False))
+    points = alt.Chart(frame).mark_circle(size=80).encode(
+        x=x, y=y,
+        color=alt.Color(field="frontier", type="nominal"),
+        tooltip=[alt.Tooltip(field=column) for column in ("ef", recall_column, "p95 (ms)", "QPS")]
+    )
+    frontier = alt.Chart(frame[frame["frontier"]]).mark_line().encode(
+        x=x, y=y, order=alt.Order(field="p95 (ms)", type="quantitative")
+    )
+    st.altair_chart(points + frontier, use_container_width=True)
+    st.download_button(
+        label="Export as CSV",
+        data=frame.to_csv(index=False),
+        file_name="ef_benchmark.csv",
+        mime="text/csv"
+    )
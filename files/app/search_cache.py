@@ -0,0 +1,72 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+import streamlit as st
+from app_config import APP_CONFIG
+from embed_cache import normalize_text
+
+# Cache settings (generated from the search_cache_* Ansible variables)
+SEARCH_CACHE_CONFIG = APP_CONFIG.get("search_cache", {})
+
+def search_cache_key(payload):
+    """Key a search request by collection and a digest of its normalized payload
+    
+    Query text is whitespace-normalized and every option takes part in the
+    digest, so only requests that would return the same response share a key.
+    """
+    normalized = dict(payload)
+    if normalized.get("query_text"):
+        normalized["query_text"] = normalize_text(normalized["query_text"])
+    canonical = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return payload.get("collection_name"), hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class SearchResultCache:
+    """Thread-safe LRU cache of search responses whose entries expire after ttl seconds"""
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Return a copy of the cached response for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+    
+    def put(self, key, result):
+        """Store a response, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, collection_name):
+        """Drop every cached response for a collection"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == collection_name]:
+                del self._entries[key]
+    
+    def __len__(self):
+        return len(self._entries)
+
+@st.cache_resource
+def get_search_cache():
+    """Return the search result cache shared by all sessions"""
+    return SearchResultCache(
+        SEARCH_CACHE_CONFIG.get("max_entries", 1000),
+        SEARCH_CACHE_CONFIG.get("ttl_seconds", 300)
+    )
@@ -0,0 +1,109 @@
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+import api_client
+from batch_search import post_search
+from search_cache import get_search_cache, search_cache_key
+
+# Background workers for prefetching the next result page
+PREFETCH_WORKERS = 4
+
+# Largest "limit" the search API accepts
+MAX_SEARCH_LIMIT = 100
+
+class PageLimitError(Exception):
+    """Raised when the next page can only be reached by asking for more than MAX_SEARCH_LIMIT results"""
+
+@st.cache_resource
+def get_prefetch_executor():
+    """Return the thread pool shared by all sessions for next-page prefetches"""
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS)
+
+def new_paging(payload, results, conditions=None):
+    """Paging state for a result set whose first page was fetched with payload
+    
+    Filter conditions are kept so further pages can be re-checked against them.
+    """
+    return {
+        "payload": payload,
+        "page_size": payload["limit"],
+        "offset": len(results),
+        "has_more": len(results) >= payload["limit"],
+        "seen_ids": {item.get("id") for item in results},
+        # None until a second page shows whether the API honours "offset"
+        "offset_supported": None,
+        "prefetch": None,
+        "conditions": conditions or [],
+    }
+
+def fetch_page(payload, offset, page_size, offset_supported, seen_ids, cache, session=None):
+    """Fetch the results after offset, returning (new results, whether the API honours offset)
+    
+    The page is requested with "offset". If the API ignores it (the page repeats
+    results already shown), the request is repeated with limit = offset + page_size
+    and the already-seen head is dropped, which raises PageLimitError once that limit
+    would pass MAX_SEARCH_LIMIT. Responses go through the search result cache.
+    Background callers pass the cache and session fetched on the script thread.
+    """
+    if offset_supported is not False:
+        page = _cached_search(cache, {**payload, "offset": offset, "limit": page_size}, session)
+        if not any(item.get("id") in seen_ids for item in page):
+            return page, True
+    if offset + page_size > MAX_SEARCH_LIMIT:
+        raise PageLimitError(f"The API ignores offsets, so more results would need a limit above {MAX_SEARCH_LIMIT}; "
+                             f"the first {offset} results are all that can be shown.")
+    page = _cached_search(cache, {**payload, "limit": offset + page_size}, session)
+    return page[offset:], False
+
+def _cached_search(cache, payload, session):
+    """Results of one search, from the result cache when possible"""
+    key = search_cache_key(payload)
+    result = cache.get(key)
+    if result is None:
+        result, _ = post_search(payload, session)
+        cache.put(key, result)
+    return result.get("results", [])
+
+def _fetch_next(paging):
+    """Fetch the page after the current offset on the script thread"""
+    return fetch_page(
+        paging["payload"], paging["offset"], paging["page_size"], paging["offset_supported"], paging["seen_ids"],
+        get_search_cache()
+    )
+
+def start_prefetch(paging):
+    """Begin fetching the page after the current offset on a background thread"""
+    if not paging["has_more"]:
+        paging["prefetch"] = None
+        return
+    future = get_prefetch_executor().submit(
+        fetch_page, paging["payload"], paging["offset"], paging["page_size"],
+        paging["offset_supported"], set(paging["seen_ids"]), get_search_cache(), api_client.get_session()
+    )
+    paging["prefetch"] = (paging["offset"], future)
+
+def next_page(paging):
+    """Return the next page, using the prefetched one if it is for the current offset
+    
+    A failed prefetch is discarded and the page fetched again here. When the page
+    is out of reach (PageLimitError), paging stops and the error is raised.
+    """
+    prefetch, paging["prefetch"] = paging.get("prefetch"), None
+    try:
+        if prefetch and prefetch[0] == paging["offset"]:
+            try:
+                page, offset_supported = prefetch[1].result()
+            except PageLimitError:
+                raise
+            except Exception:
+                page, offset_supported = _fetch_next(paging)
+        else:
+            page, offset_supported = _fetch_next(paging)
+    except PageLimitError:
+        paging["offset_supported"] = False
+        paging["has_more"] = False
+        raise
+    paging["offset_supported"] = offset_supported
+    paging["offset"] += len(page)
+    paging["has_more"] = len(page) >= paging["page_size"]
+    paging["seen_ids"].update(item.get("id") for item in page)
+    return page
@@ -1,5 +1,7 @@
 import streamlit as st
 import base64
+import hashlib
+from itertools import islice
 from datetime import datetime
 
 # API endpoints
@@ -425,4 +427,21 @@ def render_stats(title, value, description=None, delta=None, delta_color="normal
             <div style="font-size: 1.5rem; font-weight: 600; margin-top: 5px;">{value}{delta_html}</div>
             {description_html}
         </div>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+
+def job_fingerprint(*parts):
+    """Identify a job by its inputs so a checkpoint is only resumed for the same job"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+def iter_chunks(iterable, chunk_size):
+    """Split an iterable into lists of at most chunk_size items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk